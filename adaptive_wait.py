@@ -0,0 +1,151 @@
+import time
+import numpy as np
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from log_config import logger
+from window_manager import Region
+
+
+def grab_region(region: Region) -> np.ndarray:
+    """截取屏幕区域，隔 4 个像素取样并转为灰度，降低比较开销。"""
+    import pyautogui
+
+    image = pyautogui.screenshot(region=region)
+    return np.asarray(image.convert("L"), dtype=np.int16)[::4, ::4]
+
+
+def frames_differ(a: np.ndarray, b: np.ndarray, pixel_threshold: int, change_ratio: float) -> bool:
+    """两张 grab_region 截图中灰度差超过 pixel_threshold 的像素占比超过 change_ratio 时视为画面变化。"""
+    if a.shape != b.shape:
+        return True
+    return np.count_nonzero(np.abs(a - b) > pixel_threshold) > a.size * change_ratio
+
+
+class AdaptiveWait:
+    """
+    自适应等待：GUI 操作后轮询截图，屏幕区域出现变化就返回，配置的等待时间作为上限。
+    上限随观测到的延迟上调（不超过配置值的 4 倍）并按 ceiling_decay 回落，floor 为最短等待时间。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        poll_interval: float = 0.02,
+        pixel_threshold: int = 16,
+        change_ratio: float = 0.002,
+        history_size: int = 50,
+        ceiling_decay: float = 0.9,
+        grab: Callable[[Region], np.ndarray] = grab_region,
+    ):
+        self.enabled = enabled
+        self.poll_interval = poll_interval
+        self.pixel_threshold = pixel_threshold  # 灰度差超过该值的像素视为变化
+        self.change_ratio = change_ratio  # 变化像素占比超过该值视为界面发生了变化
+        self.ceiling_decay = ceiling_decay  # 每次观测后上限向新观测值回落的比例
+        self.grab = grab
+        self.ceilings: Dict[str, float] = {}  # 观测到的延迟给出的上限，高于配置值时生效
+        self.latencies: Dict[str, deque] = {}
+        self.timeouts: Dict[str, int] = {}
+        self._history_size = history_size
+
+    def changed(self, a: np.ndarray, b: np.ndarray) -> bool:
+        return frames_differ(a, b, self.pixel_threshold, self.change_ratio)
+
+    def ceiling(self, key: str, configured: float) -> float:
+        """等待上限：配置值，观测到的延迟变大时自动上调。"""
+        return min(max(configured, self.ceilings.get(key, 0.0)), configured * 4)
+
+    def record(self, key: str, latency: float):
+        self.latencies.setdefault(key, deque(maxlen=self._history_size)).append(latency)
+        # 更慢的观测立即抬高上限，更快的观测让上限按 ceiling_decay 逐渐回落
+        target = latency * 1.5
+        current = self.ceilings.get(key, 0.0)
+        if target >= current:
+            self.ceilings[key] = target
+        else:
+            self.ceilings[key] = current * self.ceiling_decay + target * (1 - self.ceiling_decay)
+
+    def stats(self) -> dict:
+        return {
+            key: {
+                "count": len(history),
+                "p50": round(float(np.percentile(history, 50)), 3),
+                "p95": round(float(np.percentile(history, 95)), 3),
+                "timeouts": self.timeouts.get(key, 0),
+            }
+            for key, history in self.latencies.items()
+        }
+
+    def wait_for_change(
+        self,
+        key: str,
+        region: Region,
+        baseline: np.ndarray,
+        start: float,
+        configured: float,
+        settle: bool = False,
+        floor: float = 0.0,
+    ) -> float:
+        """
+        轮询区域直到与基准不同，返回观测到的延迟；超过上限仍未变化则按上限返回。
+        settle 为 True 时，变化之后还要等到画面稳定（连续两帧相同），用于搜索结果等逐步刷新的界面。
+        检测到变化时距 start 不足 floor 秒则补足。
+        """
+        deadline = start + self.ceiling(key, configured)
+        previous = None
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                self.timeouts[key] = self.timeouts.get(key, 0) + 1
+                logger.debug("等待界面变化超时: %s，%.3f 秒", key, now - start)
+                return now - start
+            time.sleep(min(self.poll_interval, deadline - now))
+            frame = self.grab(region)
+            if previous is None:
+                if self.changed(frame, baseline):
+                    if not settle:
+                        break
+                    previous = frame
+            elif not self.changed(frame, previous):
+                break
+            else:
+                previous = frame
+        latency = time.monotonic() - start
+        self.record(key, latency)
+        if latency < floor:
+            time.sleep(floor - latency)
+            return floor
+        return latency
+
+    @contextmanager
+    def wait(self, key: str, region: Optional[Region], configured: float, settle: bool = False, floor: float = 0.0):
+        """
+        包裹一个会引起界面变化的操作：进入时截取基准，退出时等待变化。
+        未启用或截图失败时退化为固定 sleep(configured)。
+
+        >>> with adaptive_waiter.wait("chat_switch", QQ_WINDOW_REGION, WAIT_TIME):
+        ...     input_backend.press("enter")
+        """
+        baseline = None
+        if self.enabled and region:
+            try:
+                baseline = self.grab(region)
+            except Exception as e:
+                logger.warning(f"截图失败，关闭自适应等待: {e}")
+                self.enabled = False
+        start = time.monotonic()
+        yield
+        if baseline is None:
+            time.sleep(configured)
+            return
+        try:
+            self.wait_for_change(key, region, baseline, start, configured, settle, floor)
+        except Exception as e:
+            logger.warning(f"截图失败，关闭自适应等待: {e}")
+            self.enabled = False
+            time.sleep(max(0.0, start + configured - time.monotonic()))
+
+
+# 全局自适应等待引擎
+adaptive_waiter = AdaptiveWait()
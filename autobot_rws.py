@@ -1,18 +1,90 @@
 import json
 import time
 import asyncio
+import inspect
+import logging
 import websockets
-from typing import Callable, Literal, Optional, Dict
-from log_config import logger
-from notify_auto import qq_send_message, get_event
-from tui import recursive_update
+from typing import Callable, Literal, Optional, Dict, List
+from log_config import logger, log_sampled, Payload
+from notify_auto import subscribe_events, notification_dedup, event_queue
+from send_queue import send_queue
+from adaptive_wait import adaptive_waiter
+from sidebar_index import sidebar_index
+from send_confirm import send_confirmer
+from sender_index import sender_index
+from event_journal import EventJournal
+from inbound_queue import event_key, coalesce_event
+
+# JSON 编解码：优先使用 orjson / ujson，没有安装时回退到标准库。编码结果统一为 str，以文本帧发送
+try:
+    import orjson
+
+    JSON_CODEC = "orjson"
+
+    def json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    json_loads = orjson.loads
+except ImportError:
+    try:
+        import ujson
+
+        JSON_CODEC = "ujson"
+
+        def json_dumps(obj) -> str:
+            return ujson.dumps(obj, ensure_ascii=False)
+
+        json_loads = ujson.loads
+    except ImportError:
+        JSON_CODEC = "json"
+
+        def json_dumps(obj) -> str:
+            return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+        json_loads = json.loads
+
+
+def merge_event_frames(old: str, new: str) -> Optional[str]:
+    """合并两个已序列化的消息事件，供事件日志的 coalesce 策略使用，不能合并时返回 None。"""
+    target = json_loads(old)
+    if not coalesce_event(target, json_loads(new)):
+        return None
+    return json_dumps(target)
+
+
+class EventTemplate:
+    """
+    预编译的事件模板。
 
+    每种事件的默认字段只构建一次，生成事件时用浅拷贝合并，只对模板中值为 dict 的字段（如 sender）
+    再合并一层，代替每个事件都重新构建默认字典并调用 recursive_update 深度合并。
+    """
+
+    def __init__(self, defaults: dict):
+        self.defaults = defaults
+        self.nested_keys = tuple(key for key, value in defaults.items() if isinstance(value, dict))
+
+    def render(self, event: dict, **dynamic) -> dict:
+        result = {**self.defaults, **dynamic, **event}
+        for key in self.nested_keys:
+            value = event.get(key)
+            if isinstance(value, dict):
+                result[key] = {**self.defaults[key], **value}
+        return result
+
+
+def register_action(name: str = None, lane: Literal["fast", "gui"] = "fast"):
+    """
+    注册动作。lane 声明动作走哪条通道：
+    - fast: 不操作 GUI 的动作，收到后立即执行并回复；
+    - gui: 需要操作 QQ 窗口的动作，作为独立任务进入串行的 GUI 队列，不阻塞后续请求。
+    """
 
-def register_action(name: str = None):
     def decorator(func: Callable):
         # 标记方法为待注册动作
         func._is_action = True
         func._action_name = name or func.__name__
+        func._action_lane = lane
         return func
 
     return decorator
@@ -26,7 +98,71 @@ class ReverseWebSocketProtocol:
         self.ping_interval = ping_interval
         self.ping_timeout = ping_timeout
         self.registered_actions: Dict[str, Callable] = {}
+        self.action_lanes: Dict[str, str] = {}
+        # 发送动作的入口：默认是单个 QQ 窗口的发送队列，多 QQ 实例模式下替换为 WorkerPool
+        self.send_queue = send_queue
+        self.journal: Optional[EventJournal] = None  # 事件日志，由启动代码设置，用于在 get_status 中报告积压
         self._register_actions()
+        self._compile_event_templates()
+
+    def _compile_event_templates(self):
+        self.private_message_template = EventTemplate(
+            {
+                "time": 0,
+                "self_id": int(self.bot_qid),
+                "post_type": "message",
+                "message_type": "private",
+                "sub_type": "friend",
+                "message_id": 0,
+                "user_id": 0,
+                "message": [],
+                "raw_message": "",
+                "font": 26,
+                "sender": {
+                    "user_id": 0,
+                    "nickname": "",
+                    "sex": "unknown",
+                    "age": 0,
+                },
+            }
+        )
+        self.group_message_template = EventTemplate(
+            {
+                "time": 0,
+                "self_id": int(self.bot_qid),
+                "post_type": "message",
+                "message_type": "group",
+                "sub_type": "normal",
+                "message_id": 0,
+                "group_id": 0,
+                "user_id": 0,
+                "anonymous": None,
+                "message": [],
+                "raw_message": "",
+                "font": 26,
+                "sender": {
+                    "user_id": 0,
+                    "nickname": "",
+                    "card": "",
+                    "sex": "unknown",
+                    "age": 0,
+                    "area": "unknown",
+                    "level": "",
+                    "role": "",
+                    "title": "",
+                },
+            }
+        )
+        self.heartbeat_template = EventTemplate(
+            {
+                "time": 0,
+                "self_id": int(self.bot_qid),
+                "post_type": "meta_event",
+                "meta_event_type": "heartbeat",
+                "status": {"good": True, "online": True},
+                "interval": self.ping_interval * 1000,
+            }
+        )
 
     def _register_actions(self):
         # 通过类和方法名反射获取被装饰的方法
@@ -35,14 +171,23 @@ class ReverseWebSocketProtocol:
             if hasattr(attr, "_is_action"):
                 action_name = getattr(attr, "_action_name", attr_name)
                 self.registered_actions[action_name] = attr
+                self.action_lanes[action_name] = getattr(attr, "_action_lane", "fast")
+
+    def get_action_lane(self, name: str) -> str:
+        """动作所在的通道，未注册的动作直接快速返回错误。"""
+        return self.action_lanes.get(name, "fast")
 
-    def execute_action(self, name: str, *args, **kwargs):
+    async def execute_action(self, name: str, *args, **kwargs):
         """
         根据名称执行注册的动作。这里需要注意，注册的动作在类中是未绑定方法，
         调用时需要传递实例 self 作为第一个参数。
+        动作既可以是普通函数，也可以是协程函数（例如需要等待 GUI 执行器的发送动作）。
         """
         if name in self.registered_actions:
-            return self.registered_actions[name](*args, **kwargs)
+            result = self.registered_actions[name](*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
         else:
             return {"retcode": 1404, "message": "Unsupported action: " + name}
 
@@ -70,15 +215,15 @@ class ReverseWebSocketProtocol:
         }
         if status == "failed":
             logger.warning(f"失败：{res}")
-        return json.dumps(res)
+        return json_dumps(res)
 
-    def parse_request(self, req: dict):
-        logger.debug(f"解析请求：{req}")
+    async def parse_request(self, req: dict):
+        logger.debug("解析请求：%s", Payload(req))
         action = req.get("action", "")
         params = req.get("params", {})
         echo = req.get("echo", "")
         try:
-            response = self.execute_action(action, params)
+            response = await self.execute_action(action, params)
             return self.build_response(**response, echo=echo)
         except Exception as e:
             logger.error(f"执行动作时发生异常：{e}")
@@ -92,7 +237,7 @@ class ReverseWebSocketProtocol:
         self,
         sub_type: Literal["enable", "disable", "connect"],
     ):
-        return json.dumps(
+        return json_dumps(
             {
                 "time": int(time.time()),
                 "self_id": int(self.bot_qid),
@@ -103,38 +248,10 @@ class ReverseWebSocketProtocol:
         )
 
     def build_event_heartbeat(self):
-        return json.dumps(
-            {
-                "time": int(time.time()),
-                "self_id": int(self.bot_qid),
-                "post_type": "meta_event",
-                "meta_event_type": "heartbeat",
-                "status": {"good": True, "online": True},
-                "interval": self.ping_interval * 1000,
-            }
-        )
+        return json_dumps(self.heartbeat_template.render({}, time=int(time.time())))
 
     def build_event_private_message(self, event: dict):
-        base_event = {
-            "time": int(time.time()),
-            "self_id": int(self.bot_qid),
-            "post_type": "message",
-            "message_type": "private",
-            "sub_type": "friend",
-            "message_id": 0,
-            "user_id": 0,
-            "message": [],
-            "raw_message": "",
-            "font": 26,
-            "sender": {
-                "user_id": 0,
-                "nickname": "",
-                "sex": "unknown",
-                "age": 0,
-            },
-        }
-        recursive_update(base_event, event)
-        return json.dumps(base_event)
+        return json_dumps(self.private_message_template.render(event, time=int(time.time())))
 
     def parse_event_response_private_message(self, data: dict):
         """
@@ -149,71 +266,50 @@ class ReverseWebSocketProtocol:
         logger.critical(f"暂不支持快速操作：{data}")
 
     def build_event_group_message(self, event: dict):
-        base_event = {
-            "time": int(time.time()),
-            "self_id": int(self.bot_qid),
-            "post_type": "message",
-            "message_type": "group",
-            "sub_type": "normal",
-            "message_id": 0,
-            "group_id": 0,
-            "user_id": 0,
-            "anonymous": None,
-            "message": [],
-            "raw_message": "",
-            "font": 26,
-            "sender": {
-                "user_id": 0,
-                "nickname": "",
-                "card": "",
-                "sex": "unknown",
-                "age": 0,
-                "area": "unknown",
-                "level": "",
-                "role": "",
-                "title": "",
-            },
-        }
-        # 将 base_event 递归更新为 event 中的内容
-        recursive_update(base_event, event)
-        return json.dumps(base_event)
+        # 将模板与 event 中的内容合并
+        return json_dumps(self.group_message_template.render(event, time=int(time.time())))
 
     def parse_event_response_group_message(self, data: dict):
         if data is None or data == {}:
             return
         logger.critical(f"暂不支持快速操作：{data}")
 
-    def send_message(self, message_type, id, message):
+    async def send_message(self, message_type, id, message):
         if message_type not in ["private", "group"]:
             return {"retcode": 1400, "message": f"Unsupported message_type: {message_type}"}
         if not id:
             return {"retcode": 1400, "message": "user_id or group_id not provided"}
         if not message:
             return {"retcode": 1400, "message": "Request data is empty"}
-        message_id = qq_send_message(message_type, id, message)
-        if message_id is None:
+        # 发送消息需要操作 QQ 窗口，经发送队列合并后交给 GUI 执行器串行执行，不阻塞事件循环
+        result = await self.send_queue.submit(message_type, id, message)
+        if result is None:
             return {"retcode": 1401, "message": "Failed to send message"}
-        return {"data": {"message_id": message_id}, "message": "Message sent successfully"}
-
-    @register_action()
-    def send_msg(self, data: dict):
-        return self.send_message(
+        # chunks 为长文本切分后实际发出的消息数，latency 为开启发送确认时消息出现在聊天区域的延迟
+        data = {"message_id": result.message_id, "chunks": result.chunks}
+        if result.latency is not None:
+            data["latency"] = round(result.latency, 3)
+        return {"data": data, "message": "Message sent successfully"}
+
+    @register_action(lane="gui")
+    async def send_msg(self, data: dict):
+        return await self.send_message(
             message_type=data.get("message_type", ""),
             id=data.get("group_id", None) or data.get("user_id", ""),
             message=data.get("message", ""),
         )
 
-    @register_action()
-    def send_private_msg(self, data: dict):
-        return self.send_message(
+    @register_action(lane="gui")
+    async def send_private_msg(self, data: dict):
+        return await self.send_message(
             message_type="private",
             id=data.get("user_id", ""),
             message=data.get("message", ""),
         )
 
-    @register_action()
-    def send_group_msg(self, data: dict):
-        return self.send_message(
+    @register_action(lane="gui")
+    async def send_group_msg(self, data: dict):
+        return await self.send_message(
             message_type="group",
             id=data.get("group_id", ""),
             message=data.get("message", ""),
@@ -221,11 +317,38 @@ class ReverseWebSocketProtocol:
 
     @register_action()
     def get_status(self, data):
-        return {"online": True, "good": True, "stat": {}}  # 返回状态
+        # 返回状态，stat 中附带发送队列的调度统计、自适应等待的延迟统计、最近聊天列表的命中统计、发送确认的延迟统计
+        # 、通知去重的计数、群成员索引的命中统计、上报事件队列和事件日志的积压深度与丢弃计数
+        stat = {
+            **self.send_queue.stats(),
+            "adaptive_wait": adaptive_waiter.stats(),
+            "sidebar_index": sidebar_index.stats(),
+            "send_confirm": send_confirmer.stats(),
+            "notification_dedup": notification_dedup.stats(),
+            "sender_index": sender_index.stats(),
+            "event_queue": event_queue.stats(),
+        }
+        if self.journal is not None:
+            stat["event_journal"] = self.journal.stats()
+        return {"data": {"online": True, "good": True, "stat": stat}}
 
     @register_action()
     def can_send_image(self, data):
-        return {"yes": True}
+        return {"data": {"yes": True}}
+
+
+async def respond_request(
+    websocket: websockets.ClientConnection,
+    adapter: ReverseWebSocketProtocol,
+    req: dict,
+):
+    """执行一个请求并发送响应，响应中带回请求的 echo，由对端据此匹配。"""
+    response = await adapter.parse_request(req)
+    log_sampled("response", logging.INFO, "发送响应: %s", Payload(response))
+    try:
+        await websocket.send(response)
+    except websockets.exceptions.ConnectionClosed:
+        logger.error(f"连接已关闭，无法发送响应，echo: {req.get('echo', '')}")
 
 
 async def receive_messages(
@@ -233,17 +356,26 @@ async def receive_messages(
     adapter: ReverseWebSocketProtocol,
 ):
     logger.info("启动接收任务")
+    # 正在执行的 GUI 请求及其 echo
+    in_flight: Dict[asyncio.Task, str] = {}
     try:
         async for request in websocket:
-            req = json.loads(request)
-            logger.info(f"收到请求: {req}")
-            response = adapter.parse_request(req)
-            logger.info(f"发送响应: {response}")
-            await websocket.send(response)
+            req = json_loads(request)
+            log_sampled("request", logging.INFO, "收到请求: %s", Payload(req))
+            if adapter.get_action_lane(req.get("action", "")) == "gui":
+                # GUI 动作作为独立任务执行，不阻塞后续请求
+                task = asyncio.create_task(respond_request(websocket, adapter, req))
+                in_flight[task] = str(req.get("echo", ""))
+                task.add_done_callback(in_flight.pop)
+            else:
+                # 不操作 GUI 的动作立即执行并回复
+                await respond_request(websocket, adapter, req)
     except websockets.exceptions.ConnectionClosed:
         logger.error("当前连接已关闭")
     except Exception as e:
         logger.error(f"接收消息时发生异常: {e}")
+    if in_flight:
+        logger.warning(f"连接结束时仍有 {len(in_flight)} 个 GUI 请求在执行，echo: {list(in_flight.values())}")
 
 
 async def send_hearbeat(
@@ -262,43 +394,67 @@ async def send_hearbeat(
         logger.error(f"发送心跳时发生异常: {e}")
 
 
+async def journal_events(
+    adapter: ReverseWebSocketProtocol,
+    journal: EventJournal,
+):
+    """
+    将通知事件序列化后写入事件日志。与 WebSocket 连接无关，断线期间收到的事件也会被持久化。
+    """
+    logger.info("事件日志任务启动")
+    async for events in subscribe_events():
+        frames = []
+        keys = []
+        for event in events:
+            if event["post_type"] == "message" and event["message_type"] == "private":
+                frames.append(adapter.build_event_private_message(event))
+            elif event["post_type"] == "message" and event["message_type"] == "group":
+                frames.append(adapter.build_event_group_message(event))
+            else:
+                logger.error(f"未知事件类型：{event}")
+                continue
+            keys.append(event_key(event))
+        try:
+            journal.append(frames, keys)
+        except Exception as e:
+            logger.error(f"写入事件日志时发生异常，这批事件将在下次写入时重试: {e}")
+
+
 async def send_messages(
     websocket: websockets.ClientConnection,
-    adapter: ReverseWebSocketProtocol,
+    uri: str,
+    journal: EventJournal,
 ):
-    # 持续从命令行读取输入发送消息
-    logger.info("Monitor 启动")
+    # 按顺序发送事件日志中该端点尚未确认的事件，对端确认后推进游标；重连后会从游标处补发
+    logger.info(f"Monitor 启动：{uri}")
     try:
         while True:
-            event = await get_event()
-            if event:
-                if event["post_type"] == "message" and event["message_type"] == "private":
-                    event = adapter.build_event_private_message(event)
-                    logger.info(f"发送消息：{event}")
-                    await websocket.send(event)
-                elif event["post_type"] == "message" and event["message_type"] == "group":
-                    event = adapter.build_event_group_message(event)
-                    logger.info(f"发送消息：{event}")
-                    await websocket.send(event)
-                else:
-                    logger.error(f"未知事件类型：{event}")
-            await asyncio.sleep(0.001)
+            records = journal.read(uri)
+            if not records:
+                journal.flush()
+                await journal.wait(uri)
+                continue
+            for seq, event in records:
+                log_sampled("event", logging.INFO, "发送消息：%s", Payload(event))
+                await websocket.send(event)
+            # send 返回只代表写入了本地缓冲区。WebSocket 帧是有序的，收到 pong 说明对端已经读到这批事件
+            pong_waiter = await websocket.ping()
+            await pong_waiter
+            journal.ack(uri, records[-1][0])
     except websockets.exceptions.ConnectionClosed:
-        logger.error("当前连接已关闭")
+        logger.error(f"当前连接已关闭：{uri}")
     except Exception as e:
         logger.error(f"发送消息时发生异常: {e}")
 
 
 async def open_websocket(
-    uri,
-    bot_qid,
-    reconnect_delay,
-    ping_interval,
-    ping_timeout,
+    uri: str,
+    adapter: ReverseWebSocketProtocol,
+    journal: EventJournal,
 ):
+    bot_qid = adapter.bot_qid
+    ping_interval = adapter.ping_interval
     logger.info(f"启动反向 WebSocket 连接：{uri}")
-    adapter = ReverseWebSocketProtocol(uri, bot_qid, reconnect_delay, ping_interval, ping_timeout)
-    logger.info(f"已注册动作：{adapter.registered_actions.keys()}")
     async with websockets.connect(
         uri,
         additional_headers={
@@ -307,9 +463,9 @@ async def open_websocket(
             "User-Agent": "OneBot/11",
         },
         ping_interval=ping_interval,
-        ping_timeout=ping_timeout,
+        ping_timeout=adapter.ping_timeout,
     ) as ws:
-        logger.info(f"反向 WebSocket 连接成功")
+        logger.info(f"反向 WebSocket 连接成功：{uri}")
         # 发送 lifecycle 事件
         req = adapter.build_event_lifetime("connect")
         logger.info(f"发送生命周期事件: {req}")
@@ -318,7 +474,7 @@ async def open_websocket(
 
         # 同时启动接收、发送、心跳任务
         receive_task = asyncio.create_task(receive_messages(ws, adapter))
-        send_task = asyncio.create_task(send_messages(ws, adapter))
+        send_task = asyncio.create_task(send_messages(ws, uri, journal))
         heartbeat_task = asyncio.create_task(send_hearbeat(ws, adapter, ping_interval))
         done, pending = await asyncio.wait(
             [receive_task, send_task, heartbeat_task],
@@ -329,31 +485,37 @@ async def open_websocket(
             task.cancel()
 
 
-async def run_reverse_websocket(
-    uri,
-    bot_qid,
-    reconnect_delay=5,
-    ping_interval=20,
-    ping_timeout=10,
+async def run_endpoint(
+    uri: str,
+    adapter: ReverseWebSocketProtocol,
+    journal: EventJournal,
 ):
+    """维持到一个端点的反向 WebSocket 连接，断开后独立重连。"""
+    reconnect_delay = adapter.reconnect_delay
     while True:
         try:
-            await open_websocket(
-                uri,
-                bot_qid,
-                reconnect_delay,
-                ping_interval,
-                ping_timeout,
-            )
+            await open_websocket(uri, adapter, journal)
         except asyncio.TimeoutError as e:
-            logger.error(f"超时，等待 {reconnect_delay} 秒后重连... {e}")
+            logger.error(f"超时，等待 {reconnect_delay} 秒后重连 {uri} ... {e}")
         except (websockets.exceptions.ConnectionClosedError, websockets.exceptions.InvalidStatusCode) as e:
-            logger.error(f"连接异常，等待 {reconnect_delay} 秒后重连... {e}")
+            logger.error(f"连接异常，等待 {reconnect_delay} 秒后重连 {uri} ... {e}")
         except Exception as e:
-            logger.error(f"其他异常，等待 {reconnect_delay} 秒后重连... {e}")
+            logger.error(f"其他异常，等待 {reconnect_delay} 秒后重连 {uri} ... {e}")
         await asyncio.sleep(reconnect_delay)
 
 
+async def run_reverse_websocket(
+    uris: List[str],
+    adapter: ReverseWebSocketProtocol,
+    journal: EventJournal,
+):
+    """
+    连接一个或多个反向 WebSocket 端点。每个端点独立重连和发送心跳，
+    收到的事件只序列化一次写入共享的事件日志，再分发给所有端点；任意端点发来的动作都进入同一个 GUI 队列。
+    """
+    await asyncio.gather(*[run_endpoint(uri, adapter, journal) for uri in uris])
+
+
 # async def run_reverse_websocket(
 #     uri,
 #     bot_qid,
@@ -0,0 +1,164 @@
+import os
+import select
+import threading
+import subprocess
+from typing import Dict, List
+from log_config import logger
+
+
+class Clipboard:
+    """
+    剪贴板。粘贴文本和文件都要先写入剪贴板，再在 QQ 输入框中 ctrl+v。
+    文本通过 pyperclip 写入，文件以 text/uri-list 格式通过 xclip 写入，每次写入都会启动一个子进程。
+    """
+
+    name = "xclip"
+
+    def copy_text(self, text: str):
+        import pyperclip
+
+        pyperclip.copy(text)
+
+    def copy_uri_list(self, uris: List[str]):
+        subprocess.run(
+            ["xclip", "-selection", "clipboard", "-t", "text/uri-list"],
+            input="\r\n".join(uris).encode("utf-8"),
+            check=True,
+        )
+
+
+class XlibClipboard(Clipboard):
+    """
+    常驻的剪贴板所有者。
+
+    在进程内用 python-xlib 创建一个不可见的窗口，由一个后台线程持有 CLIPBOARD 选区，
+    QQ 粘贴时按请求的格式（TARGETS、UTF8_STRING、text/uri-list 等）直接从内存返回内容。
+    写入剪贴板只是替换内存中的内容并重新声明所有权，不需要启动任何子进程。
+    X 连接在第一次写入时建立，失败时（例如没有 X 会话）退回到 xclip。
+    """
+
+    name = "xlib"
+
+    TEXT_TARGETS = ("UTF8_STRING", "text/plain;charset=utf-8", "text/plain", "STRING", "TEXT")
+    # 超过该大小的内容需要 INCR 分段传输，这里不实现，交给 xclip
+    MAX_SIZE = 128 * 1024
+
+    def __init__(self):
+        self._display = None
+        self._window = None
+        self._atoms: Dict[str, int] = {}
+        self._contents: Dict[int, bytes] = {}  # target atom -> 内容
+        self._lock = threading.Lock()
+        self._owned = threading.Event()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        self._thread = None
+        self._failed = False
+
+    def _atom(self, name: str) -> int:
+        if name not in self._atoms:
+            self._atoms[name] = self._display.intern_atom(name)
+        return self._atoms[name]
+
+    def _start(self) -> bool:
+        if self._thread is not None or self._failed:
+            return not self._failed
+        try:
+            from Xlib import X, display
+
+            self._display = display.Display()
+            self._window = self._display.screen().root.create_window(0, 0, 1, 1, 0, X.CopyFromParent)
+            # 用到的 atom 都在这里提前注册，之后只读，不会在多个线程中同时使用 X 连接
+            for name in ("CLIPBOARD", "TARGETS", "text/uri-list", "x-special/gnome-copied-files", *self.TEXT_TARGETS):
+                self._atom(name)
+        except Exception as e:
+            logger.warning(f"无法连接 X 服务器，剪贴板退回到 xclip: {e}")
+            self._failed = True
+            return False
+        self._thread = threading.Thread(target=self._serve, name="autobot-clipboard", daemon=True)
+        self._thread.start()
+        return True
+
+    def _set(self, contents: Dict[str, bytes]):
+        with self._lock:
+            self._contents = {self._atom(target): data for target, data in contents.items()}
+        self._owned.clear()
+        os.write(self._wakeup_w, b"\0")
+        if not self._owned.wait(timeout=1):
+            logger.warning("等待剪贴板所有权超时")
+
+    def copy_text(self, text: str):
+        data = text.encode("utf-8")
+        if len(data) > self.MAX_SIZE or not self._start():
+            return super().copy_text(text)
+        self._set({target: data for target in self.TEXT_TARGETS})
+
+    def copy_uri_list(self, uris: List[str]):
+        if not self._start():
+            return super().copy_uri_list(uris)
+        self._set(
+            {
+                "text/uri-list": "\r\n".join(uris).encode("utf-8"),
+                "x-special/gnome-copied-files": ("copy\n" + "\n".join(uris)).encode("utf-8"),
+                "UTF8_STRING": "\n".join(uris).encode("utf-8"),
+            }
+        )
+
+    def _serve(self):
+        """后台线程：声明选区所有权，响应其他程序的粘贴请求。"""
+        from Xlib import X
+
+        fileno = self._display.fileno()
+        while True:
+            readable, _, _ = select.select([fileno, self._wakeup_r], [], [])
+            if self._wakeup_r in readable:
+                os.read(self._wakeup_r, 4096)
+                self._window.set_selection_owner(self._atom("CLIPBOARD"), X.CurrentTime)
+                self._display.flush()
+                self._owned.set()
+            while self._display.pending_events():
+                event = self._display.next_event()
+                try:
+                    if event.type == X.SelectionRequest:
+                        self._reply(event)
+                    elif event.type == X.SelectionClear:
+                        logger.debug("剪贴板所有权被其他程序取得")
+                except Exception as e:
+                    # 请求方窗口可能已经关闭
+                    logger.warning(f"响应剪贴板请求失败: {e}")
+
+    def _reply(self, request):
+        from Xlib import X, Xatom
+        from Xlib.protocol import event
+
+        prop = request.property or request.target  # 旧的客户端不指定 property
+        with self._lock:
+            contents = self._contents
+        if request.target == self._atom("TARGETS"):
+            request.requestor.change_property(prop, Xatom.ATOM, 32, [self._atom("TARGETS"), *contents])
+        elif request.target in contents:
+            request.requestor.change_property(prop, request.target, 8, contents[request.target])
+        else:
+            prop = X.NONE
+        request.requestor.send_event(
+            event.SelectionNotify(
+                time=request.time,
+                requestor=request.requestor,
+                selection=request.selection,
+                target=request.target,
+                property=prop,
+            )
+        )
+        self._display.flush()
+
+
+def create_clipboard(name: str = "xlib") -> Clipboard:
+    """根据名称创建剪贴板后端。"""
+    if name == "xlib":
+        return XlibClipboard()
+    if name == "recording":
+        from recording import RecordingClipboard, recorder
+
+        return RecordingClipboard(recorder)
+    if name != "xclip":
+        logger.warning(f"未知的剪贴板后端: {name}，使用 xclip")
+    return Clipboard()
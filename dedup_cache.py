@@ -0,0 +1,62 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+class DedupCache:
+    """
+    有时间和大小上限的去重缓存。
+
+    QQ 的每条通知会重复发出 repeat_count 次。第一次出现时放行并记录时间，之后 window 秒内的重复被丢弃，
+    重复次数达到 repeat_count 后删除记录，之后同样内容的新消息（例如连发两次"1"）会再次放行。
+    记录按首次出现的时间顺序保存在 OrderedDict 中，过期和超出 max_size 的记录从头部淘汰，每次操作均摊 O(1)。
+    """
+
+    def __init__(
+        self,
+        repeat_count: int = 2,
+        window: float = 2.0,
+        max_size: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.repeat_count = repeat_count
+        self.window = window  # 重复通知最晚在首次出现后多少秒到达，单位为秒
+        self.max_size = max_size
+        self.clock = clock
+        self.hits = 0  # 被丢弃的重复通知数
+        self.misses = 0  # 放行的通知数
+        self.evictions = 0  # 没等到全部重复就因过期或超出大小而被淘汰的记录数
+        self._entries: "OrderedDict[Hashable, list]" = OrderedDict()  # key -> [首次出现的时间, 已出现的次数]
+
+    def _expire(self, now: float):
+        while self._entries:
+            key, (first_seen, _) = next(iter(self._entries.items()))
+            if now - first_seen < self.window and len(self._entries) <= self.max_size:
+                break
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def is_duplicate(self, key: Hashable) -> bool:
+        """记录一次通知，返回它是否为之前通知的重复（应当丢弃）。"""
+        if self.repeat_count <= 1:
+            self.misses += 1
+            return False
+        now = self.clock()
+        self._expire(now)
+        entry = self._entries.get(key)
+        if entry is None:
+            self._entries[key] = [now, 1]
+            self._expire(now)
+            self.misses += 1
+            return False
+        entry[1] += 1
+        if entry[1] >= self.repeat_count:
+            del self._entries[key]
+        self.hits += 1
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,288 @@
+import os
+import time
+import sqlite3
+import asyncio
+from collections import deque
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from log_config import logger
+from inbound_queue import POLICIES
+
+
+class EventJournal:
+    """
+    上报事件的持久化日志（基于 SQLite 的追加写日志 + 游标）。
+
+    收到的通知事件先序列化后追加到日志，再由发送任务按顺序读取并发送，对端确认收到后推进游标。
+    连接断开或者在重连等待期间产生的事件都会留在日志中，重连后按原顺序补发。
+    每个 WebSocket 端点有自己的游标，所有端点共享同一份日志。
+
+    - 追加：每批事件一个事务提交，WAL + synchronous=NORMAL，不会每个事件都 fsync。
+    - 读取：最近追加的事件同时保存在内存中，已追上的端点直接读取同一个字符串对象，不重复读盘和序列化。
+    - 确认：游标只在内存中推进，攒够一批或者空闲时才落盘，并删除所有端点都已发送的事件。
+      因此进程崩溃后最多会重复发送最后一小批事件（至少一次语义）。
+    - 容量：最多保留 max_events 条未发送的事件，磁盘占用有上限。超出时按 policy 处理：drop-oldest 丢弃最旧的事件；
+      coalesce 用 merge 把新消息合并到同一合并键（同一聊天、同一发送者）最后一个还没有被读取的事件中，
+      没有可合并的事件时同样丢弃最旧的事件。
+    - 出错：写入失败时回滚事务，这批事件留在内存中，下次追加时一起重试。
+    stats() 返回未发送事件的深度、历史最高深度、丢弃数、合并数和写入失败次数。
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        max_events: int = 10000,
+        cursor_names: List[str] = ("default",),
+        flush_batch: int = 64,
+        flush_interval: float = 1.0,
+        tail_size: int = 1024,
+        policy: str = "drop-oldest",
+        merge: Optional[Callable[[str, str], Optional[str]]] = None,
+    ):
+        self.path = path
+        self.max_events = max_events
+        if policy not in POLICIES:
+            logger.warning(f"未知的事件日志溢出策略: {policy}，使用 drop-oldest")
+            policy = "drop-oldest"
+        self.policy = policy
+        self.merge = merge  # 合并两个已序列化的事件，不能合并时返回 None
+        self.flush_batch = flush_batch
+        self.flush_interval = flush_interval
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or "./", exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS events (seq INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cursors (name TEXT PRIMARY KEY, seq INTEGER NOT NULL)")
+        saved_cursors = dict(self._conn.execute("SELECT name, seq FROM cursors").fetchall())
+        # 新增的端点从所有旧游标中最小的位置开始，保证尚未发送的事件不会丢失；不再使用的游标被删除
+        start_seq = min(saved_cursors.values()) if saved_cursors else 0
+        self.cursors: Dict[str, int] = {name: saved_cursors.get(name, start_seq) for name in cursor_names}
+        row = self._conn.execute("SELECT MAX(seq) FROM events").fetchone()
+        self.last_seq = max([row[0] or 0] + list(self.cursors.values()))  # 已写入的最大序号
+        self.dropped = 0  # 因超出容量而丢弃的事件数
+        self.coalesced = 0  # 因超出容量而合并到之前事件中的事件数
+        self.failed = 0  # 写入失败的次数
+        self.high_watermark = 0  # 未发送事件数的历史最大值
+        self._full = False  # 是否处于已满状态，只在状态变化时记录日志
+        self._retry: List[Tuple[str, Hashable]] = []  # 写入失败、等待重试的 (事件, 合并键)
+        self._latest: Dict[Hashable, int] = {}  # 合并键 -> 该键最后一个未发送事件的序号
+        self._read_seq = 0  # 已经被读取过的最大序号，读取过的事件不再合并
+        self._flushed_cursors = saved_cursors
+        self._last_flush_time = time.monotonic()
+        self._tail = deque(maxlen=tail_size)  # 最近追加的 (seq, payload)
+        self._appended = asyncio.Event()
+        self.flush()
+        pending = self.pending()
+        if pending > 0:
+            logger.info(f"事件日志中有 {pending} 条未发送的事件，将在连接后补发")
+
+    def append(self, payloads: List[str], keys: Optional[List[Hashable]] = None) -> int:
+        """
+        追加一批已序列化的事件，返回最后一个事件的序号。
+        keys 为各事件的合并键，policy 为 coalesce 时使用，为 None 的事件不合并。
+        """
+        if not payloads:
+            return self.last_seq
+        keys = list(keys) if keys is not None else [None] * len(payloads)
+        if not self.cursors:
+            # 没有需要持久化的游标，只在内存中保留最近的事件
+            self.last_seq += len(payloads)
+            self._tail.extend(zip(range(self.last_seq - len(payloads) + 1, self.last_seq + 1), payloads))
+            self._appended.set()
+            return self.last_seq
+        if self._retry:
+            payloads = [payload for payload, _ in self._retry] + list(payloads)
+            keys = [key for _, key in self._retry] + keys
+            self._retry = []
+        last_seq, cursors = self.last_seq, dict(self.cursors)
+        try:
+            self._conn.execute("BEGIN")
+            if self.policy == "coalesce" and self.merge and self.last_seq - self._min_cursor() + len(payloads) > self.max_events:
+                inserted, merged, latest = self._insert_coalescing(payloads, keys)
+            else:
+                self._conn.executemany("INSERT INTO events (payload) VALUES (?)", [(p,) for p in payloads])
+                self.last_seq = self._conn.execute("SELECT MAX(seq) FROM events").fetchone()[0]
+                inserted = list(zip(range(self.last_seq - len(payloads) + 1, self.last_seq + 1), payloads))
+                merged = {}
+                latest = self._latest
+                if self.policy == "coalesce":
+                    latest = {**latest, **{key: seq for key, (seq, _) in zip(keys, inserted) if key is not None}}
+            overflow_seq = self.last_seq - self.max_events
+            dropped = 0
+            if overflow_seq > self._min_cursor():
+                # 超出容量，丢弃最旧的未发送事件
+                dropped = self._conn.execute("DELETE FROM events WHERE seq <= ?", (overflow_seq,)).rowcount
+                for name, seq in self.cursors.items():
+                    if seq < overflow_seq:
+                        self.cursors[name] = overflow_seq
+                self._write_cursors()
+            self._conn.execute("COMMIT")
+        except Exception:
+            # 回滚后连接可以继续使用；这批事件保留到下次追加时重试，最多保留 max_events 条
+            self._rollback()
+            self.last_seq, self.cursors = last_seq, cursors
+            self.failed += 1
+            overflow = len(payloads) - self.max_events
+            if overflow > 0:
+                self.dropped += overflow
+                payloads, keys = payloads[overflow:], keys[overflow:]
+            self._retry = list(zip(payloads, keys))
+            self._update_depth()
+            raise
+        self.dropped += dropped
+        self.coalesced += len(payloads) - len(inserted)
+        self._latest = latest
+        self._tail.extend(inserted)
+        for seq, payload in merged.items():
+            self._replace_tail(seq, payload)
+        self._update_depth()
+        self._appended.set()
+        return self.last_seq
+
+    def _insert_coalescing(self, payloads: List[str], keys: List[Hashable]):
+        """逐个追加事件，日志已满时把事件合并到同一合并键最后一个还没有被读取的事件中。"""
+        inserted: List[Tuple[int, str]] = []
+        merged: Dict[int, str] = {}  # 被合并修改过的事件
+        latest = dict(self._latest)
+        for payload, key in zip(payloads, keys):
+            target = latest.get(key) if key is not None else None
+            if (
+                target is not None
+                and target > max(self._read_seq, self._min_cursor())
+                and self.last_seq - self._min_cursor() >= self.max_events
+            ):
+                (old,) = self._conn.execute("SELECT payload FROM events WHERE seq = ?", (target,)).fetchone()
+                new = self.merge(old, payload)
+                if new is not None:
+                    self._conn.execute("UPDATE events SET payload = ? WHERE seq = ?", (new, target))
+                    merged[target] = new
+                    continue
+            self.last_seq = self._conn.execute("INSERT INTO events (payload) VALUES (?)", (payload,)).lastrowid
+            inserted.append((self.last_seq, payload))
+            if key is not None:
+                latest[key] = self.last_seq
+        return inserted, merged, latest
+
+    def _replace_tail(self, seq: int, payload: str):
+        if self._tail and self._tail[0][0] <= seq:
+            i = seq - self._tail[0][0]
+            if i < len(self._tail) and self._tail[i][0] == seq:
+                self._tail[i] = (seq, payload)
+
+    def pending(self) -> int:
+        """尚未被所有端点确认的事件数，包括等待重试的事件。"""
+        return self.last_seq - self._min_cursor() + len(self._retry)
+
+    def _update_depth(self):
+        pending = self.pending()
+        self.high_watermark = max(self.high_watermark, pending)
+        if pending >= self.max_events and not self._full:
+            self._full = True
+            logger.warning(f"事件日志已满（{self.max_events}），按 {self.policy} 策略处理新事件")
+        elif pending < self.max_events // 2 and self._full:
+            self._full = False
+            logger.info(f"事件日志恢复，未发送的事件 {pending} 条，累计丢弃 {self.dropped} 条")
+
+    def _min_cursor(self) -> int:
+        return min(self.cursors.values(), default=self.last_seq)
+
+    def read(self, name: str, limit: int = 64) -> List[Tuple[int, str]]:
+        """按顺序读取游标 name 之后尚未确认的事件。"""
+        return self.read_after(self.cursors[name], limit)
+
+    def read_after(self, cursor: int, limit: int = 64) -> List[Tuple[int, str]]:
+        """
+        按顺序读取序号 cursor 之后的事件。
+        正向 WebSocket 的客户端不持久化游标，只在内存中记录一个序号，用这个方法读取。
+        """
+        if self._tail and self._tail[0][0] <= cursor + 1:
+            # 已追上的端点直接从内存读取，各端点共享同一份序列化结果
+            records = []
+            for record in self._tail:
+                if record[0] > cursor:
+                    records.append(record)
+                    if len(records) >= limit:
+                        break
+        else:
+            records = self._conn.execute(
+                "SELECT seq, payload FROM events WHERE seq > ? ORDER BY seq LIMIT ?", (cursor, limit)
+            ).fetchall()
+        if records:
+            self._read_seq = max(self._read_seq, records[-1][0])
+        return records
+
+    def oldest_seq(self) -> int:
+        """还能读取到的最早事件的序号，没有事件时为 last_seq + 1。"""
+        oldest = self._tail[0][0] if self._tail else self.last_seq + 1
+        if self.cursors:
+            row = self._conn.execute("SELECT MIN(seq) FROM events").fetchone()
+            if row[0] is not None:
+                oldest = min(oldest, row[0])
+        return oldest
+
+    def ack(self, name: str, seq: int):
+        """确认游标 name 已发送 seq 及之前的事件。游标攒批落盘。"""
+        if seq <= self.cursors[name]:
+            return
+        self.cursors[name] = seq
+        if (
+            seq - self._flushed_cursors.get(name, 0) >= self.flush_batch
+            or time.monotonic() - self._last_flush_time >= self.flush_interval
+        ):
+            self.flush()
+
+    def _write_cursors(self):
+        self._conn.execute("DELETE FROM cursors")
+        self._conn.executemany("INSERT INTO cursors (name, seq) VALUES (?, ?)", list(self.cursors.items()))
+        self._flushed_cursors = dict(self.cursors)
+
+    def flush(self):
+        """将游标落盘，并删除所有端点都已发送的事件。"""
+        self._last_flush_time = time.monotonic()
+        self._update_depth()
+        if self.cursors == self._flushed_cursors:
+            return
+        flushed_cursors = self._flushed_cursors
+        try:
+            self._conn.execute("BEGIN")
+            self._write_cursors()
+            self._conn.execute("DELETE FROM events WHERE seq <= ?", (self._min_cursor(),))
+            self._conn.execute("COMMIT")
+            self._latest = {key: seq for key, seq in self._latest.items() if seq > self._min_cursor()}
+        except Exception:
+            # 游标仍视为未落盘，下次 flush 时重试
+            self._rollback()
+            self._flushed_cursors = flushed_cursors
+            self.failed += 1
+            raise
+
+    def _rollback(self):
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    async def wait(self, name: str):
+        """挂起直到游标 name 之后有新的事件写入。"""
+        await self.wait_after(self.cursors[name])
+
+    async def wait_after(self, cursor: int):
+        """挂起直到序号 cursor 之后有新的事件写入。"""
+        while self.last_seq <= cursor:
+            self._appended.clear()
+            await self._appended.wait()
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.pending(),
+            "high_watermark": self.high_watermark,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "retry": len(self._retry),
+            "policy": self.policy,
+            "max_events": self.max_events,
+        }
+
+    def close(self):
+        self.flush()
+        self._conn.close()
@@ -0,0 +1,75 @@
+import os
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Optional
+from log_config import logger
+
+
+class GuiExecutor:
+    """
+    GUI 执行器。
+
+    所有会操作 QQ 窗口的函数（pyautogui 键鼠操作、剪贴板、time.sleep 等待）都是阻塞的，
+    一条消息往往要耗费数秒。如果直接在事件循环中调用，心跳、事件上报和 websockets 的
+    ping/pong 都会被卡住。这里用一个单线程的线程池独占 QQ 窗口，所有 GUI 任务在其中串行执行，
+    协程通过 `await submit(...)` 等待结果，事件循环始终保持响应。
+
+    指定 display 时（多 QQ 实例模式），GUI 任务改为在一个独立的工作进程中串行执行：
+    工作进程连接到该 X display，用 config 初始化自己的 notify_auto（坐标、输入后端、当前聊天等都是独立的），
+    提交的函数和参数需要能被 pickle。
+    """
+
+    def __init__(self, name: str = "gui", display: Optional[str] = None, config: Optional[dict] = None):
+        self.name = name
+        self.display = display
+        self.pending = 0  # 已提交但尚未完成的任务数
+        if display:
+            self._executor = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker_process,
+                initargs=(name, display, config or {}),
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"autobot-{name}")
+
+    async def submit(self, func: Callable, *args, **kwargs):
+        """
+        将阻塞的 GUI 函数提交到专用线程串行执行，并等待其返回值。
+        函数抛出的异常会原样传递给调用者。
+        """
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        logger.debug("提交 GUI 任务: %s，排队中: %s", func.__name__, self.pending)
+        try:
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    def shutdown(self, wait: bool = True):
+        """关闭执行器，等待正在执行的 GUI 任务结束。"""
+        self._executor.shutdown(wait=wait)
+
+
+def init_worker_process(name: str, display: str, config: dict):
+    """
+    GUI 工作进程的初始化：先切换到自己的 X display 和日志文件，再导入并配置 notify_auto。
+    spawn 启动的子进程在这之前会重新导入主模块，各模块导入时都不连接 X（第一次使用时才连接），
+    所以在这里设置 DISPLAY 就够了，主进程的环境变量不需要改动。
+    """
+    from log_config import set_log_file, set_logger_level
+
+    set_log_file(f"autobot-{name}.log")
+    os.environ["DISPLAY"] = display
+    import notify_auto
+
+    set_logger_level(config.get("log_level", "INFO"))
+    notify_auto.set_config(config)
+    os.makedirs(notify_auto.TEMP_DIR, exist_ok=True)
+    logger.info(f"GUI 工作进程已启动，DISPLAY: {display}")
+
+
+# 默认的 GUI 执行器，在主进程中操作当前 display 上的 QQ 窗口
+gui_executor = GuiExecutor()
@@ -0,0 +1,106 @@
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Tuple
+from log_config import logger
+
+POLICIES = ("drop-oldest", "coalesce")
+
+
+def event_key(event: dict) -> Tuple:
+    """合并事件时使用的键：同一个聊天中同一个发送者的消息。"""
+    return (event.get("message_type"), event.get("group_id"), event.get("user_id"))
+
+
+def coalesce_event(target: dict, event: dict) -> bool:
+    """把消息事件 event 合并到 target 的末尾（消息段之间换行），不是消息事件时不合并。"""
+    if event.get("post_type") != "message" or target.get("post_type") != "message":
+        return False
+    target["message"] = target["message"] + [{"type": "text", "data": {"text": "\n"}}] + event["message"]
+    target["raw_message"] = f"{target['raw_message']}\n{event['raw_message']}"
+    return True
+
+
+class BoundedEventQueue:
+    """
+    有界的上报事件队列，message_monitor 写入，事件日志任务读取，写入从不阻塞。
+    队列满时按 policy 丢弃最旧的事件（drop-oldest），或把新消息合并到同一发送者的最后一个事件中（coalesce）。
+    """
+
+    def __init__(self, maxsize: int = 1000, policy: str = "drop-oldest"):
+        self.maxsize = maxsize
+        self.policy = policy
+        self.high_watermark = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self._items: Deque[dict] = deque()
+        self._latest: Dict[Tuple, dict] = {}  # 合并键 -> 队列中该键的最后一个事件
+        self._not_empty = asyncio.Event()
+        self._warned = False
+
+    def set_config(self, config: dict):
+        self.maxsize = config.get("EVENT_QUEUE_MAX_SIZE", self.maxsize)
+        policy = config.get("EVENT_QUEUE_POLICY", self.policy)
+        if policy not in POLICIES:
+            logger.warning(f"未知的事件队列溢出策略: {policy}，使用 drop-oldest")
+            policy = "drop-oldest"
+        self.policy = policy
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
+
+    def _append(self, event: dict):
+        self._items.append(event)
+        self._latest[event_key(event)] = event
+
+    def _popleft(self) -> dict:
+        event = self._items.popleft()
+        key = event_key(event)
+        if self._latest.get(key) is event:
+            del self._latest[key]
+        return event
+
+    def _coalesce(self, event: dict) -> bool:
+        target = self._latest.get(event_key(event))
+        return target is not None and coalesce_event(target, event)
+
+    def put_nowait(self, event: dict):
+        """写入一个事件，从不阻塞；队列已满时按 policy 丢弃或合并。"""
+        if len(self._items) < self.maxsize:
+            self._append(event)
+        elif self.policy == "coalesce" and self._coalesce(event):
+            self.coalesced += 1
+        else:
+            self._popleft()
+            self._append(event)
+            self.dropped += 1
+        if len(self._items) >= self.maxsize and not self._warned:
+            self._warned = True
+            logger.warning(f"上报事件队列已满（{self.maxsize}），按 {self.policy} 策略处理新事件")
+        elif len(self._items) < self.maxsize // 2:
+            self._warned = False
+        self.high_watermark = max(self.high_watermark, self.qsize())
+        self._not_empty.set()
+
+    def get_nowait(self) -> dict:
+        if not self._items:
+            raise asyncio.QueueEmpty
+        return self._popleft()
+
+    async def get(self) -> dict:
+        while not self._items:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return self._popleft()
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.qsize(),
+            "high_watermark": self.high_watermark,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "policy": self.policy,
+            "maxsize": self.maxsize,
+        }
@@ -0,0 +1,169 @@
+import time
+import shutil
+import subprocess
+from collections import namedtuple
+from typing import List, Tuple
+from log_config import logger
+
+Size = namedtuple("Size", "width height")
+
+# 一个输入步骤，例如 ("click", x, y)、("hotkey", "ctrl", "v")、("type", "text")、("sleep", 0.05)
+Step = Tuple
+
+
+class InputBackend:
+    """
+    键鼠输入后端。
+
+    所有 qq_* 函数都通过输入后端操作 QQ 窗口。后端本身不在步骤之间插入任何隐式延迟，
+    需要等待的地方由发送流程显式地 sleep 或者在 run() 的步骤列表中加入 ("sleep", 秒数)。
+    """
+
+    name = "base"
+
+    def size(self) -> Size:
+        """屏幕大小。"""
+        raise NotImplementedError
+
+    def click(self, x: int, y: int, button: str = "left"):
+        self.run([("click", x, y, button)])
+
+    def hotkey(self, *keys: str):
+        self.run([("hotkey", *keys)])
+
+    def press(self, key: str):
+        self.run([("press", key)])
+
+    def typewrite(self, text: str):
+        self.run([("type", text)])
+
+    def key_down(self, key: str):
+        self.run([("key_down", key)])
+
+    def key_up(self, key: str):
+        self.run([("key_up", key)])
+
+    def run(self, steps: List[Step]):
+        """按顺序执行一组输入步骤。"""
+        raise NotImplementedError
+
+
+class PyAutoGUIBackend(InputBackend):
+    """基于 pyautogui 的输入后端，关闭了 pyautogui 全局的 PAUSE 延迟。"""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+
+        self.pyautogui = pyautogui
+        pyautogui.PAUSE = 0
+
+    def size(self) -> Size:
+        return Size(*self.pyautogui.size())
+
+    def run(self, steps: List[Step]):
+        for op, *args in steps:
+            if op == "click":
+                x, y, *button = args
+                self.pyautogui.click(x, y, button=button[0] if button else "left")
+            elif op == "hotkey":
+                self.pyautogui.hotkey(*args)
+            elif op == "press":
+                self.pyautogui.press(args[0])
+            elif op == "type":
+                self.pyautogui.typewrite(args[0])
+            elif op == "key_down":
+                self.pyautogui.keyDown(args[0])
+            elif op == "key_up":
+                self.pyautogui.keyUp(args[0])
+            elif op == "sleep":
+                time.sleep(args[0])
+            else:
+                raise ValueError(f"不支持的输入步骤: {op}")
+
+
+class XdotoolBackend(InputBackend):
+    """
+    基于 xdotool 的输入后端（通过 XTest 扩展注入事件）。
+    一组步骤会被拼成一条 xdotool 命令链（包括其中的 sleep），只启动一个进程就能完成整段键鼠操作。
+    """
+
+    name = "xdotool"
+
+    # pyautogui 的按键名到 X keysym 的映射
+    KEY_NAMES = {
+        "enter": "Return",
+        "return": "Return",
+        "esc": "Escape",
+        "escape": "Escape",
+        "tab": "Tab",
+        "backspace": "BackSpace",
+        "delete": "Delete",
+        "space": "space",
+        "up": "Up",
+        "down": "Down",
+        "left": "Left",
+        "right": "Right",
+        "home": "Home",
+        "end": "End",
+        "pageup": "Prior",
+        "pagedown": "Next",
+        "ctrl": "ctrl",
+        "shift": "shift",
+        "alt": "alt",
+        "win": "super",
+    }
+    BUTTONS = {"left": "1", "middle": "2", "right": "3"}
+
+    def __init__(self, xdotool: str = "xdotool"):
+        self.xdotool = shutil.which(xdotool) or xdotool
+
+    def size(self) -> Size:
+        width, height = subprocess.run(
+            [self.xdotool, "getdisplaygeometry"], capture_output=True, text=True, check=True
+        ).stdout.split()
+        return Size(int(width), int(height))
+
+    def key_name(self, key: str) -> str:
+        return self.KEY_NAMES.get(key.lower(), key)
+
+    def build_command(self, steps: List[Step]) -> List[str]:
+        command = [self.xdotool]
+        for op, *args in steps:
+            if op == "click":
+                x, y, *button = args
+                command += ["mousemove", str(int(x)), str(int(y)), "click", self.BUTTONS[button[0] if button else "left"]]
+            elif op == "hotkey":
+                command += ["key", "--clearmodifiers", "+".join(self.key_name(key) for key in args)]
+            elif op == "press":
+                command += ["key", "--clearmodifiers", self.key_name(args[0])]
+            elif op == "type":
+                command += ["type", "--delay", "0", "--", args[0]]
+            elif op == "key_down":
+                command += ["keydown", self.key_name(args[0])]
+            elif op == "key_up":
+                command += ["keyup", self.key_name(args[0])]
+            elif op == "sleep":
+                command += ["sleep", f"{args[0]:.3f}"]
+            else:
+                raise ValueError(f"不支持的输入步骤: {op}")
+        return command
+
+    def run(self, steps: List[Step]):
+        if not steps:
+            return
+        subprocess.run(self.build_command(steps), check=True)
+
+
+def create_input_backend(name: str = "pyautogui") -> InputBackend:
+    """根据名称创建输入后端。"""
+    if name == "xdotool":
+        return XdotoolBackend()
+    if name == "recording":
+        from recording import RecordingBackend, recorder
+
+        return RecordingBackend(recorder)
+    if name != "pyautogui":
+        logger.warning(f"未知的输入后端: {name}，使用 pyautogui")
+    return PyAutoGUIBackend()
@@ -56,9 +56,11 @@ stream_handler.setFormatter(CustomFormatter(fmt=logger_fmt, datefmt=logger_date_
 #     backupCount=5,
 #     encoding="utf-8",
 # )
+# delay=True：第一次写日志时才打开（清空）文件，GUI 工作进程可以在此之前切换到自己的日志文件
 file_handler = logging.FileHandler(
     os.path.join(LOG_DIR, "autobot.log"),
     mode="w",
+    delay=True,
 )
 file_handler.setLevel(logging.DEBUG)
 file_handler.setFormatter(logging.Formatter(fmt=logger_fmt, datefmt=logger_date_fmt))
@@ -68,14 +70,95 @@ logger.addHandler(stream_handler)
 logger.addHandler(file_handler)
 
 
+# 热路径日志：DEBUG 开关、各类日志的采样率、日志参数中字符串的最大长度
+debug_enabled = logger.isEnabledFor(logging.DEBUG)
+log_sample_rates = {}
+log_sample_counters = {}
+log_payload_max_len = 512
+
+
+def set_log_file(filename: str):
+    """切换日志文件，多 QQ 实例模式下每个 GUI 工作进程写自己的日志文件，避免覆盖主进程的日志。"""
+    if file_handler.stream is not None:
+        file_handler.stream.close()
+        file_handler.stream = None
+    file_handler.baseFilename = os.path.abspath(os.path.join(LOG_DIR, filename))
+
+
 def set_logger_level(level: str):
     """
     设置日志级别
     :param level: 日志级别
     """
+    global debug_enabled
     logger.setLevel(level)
     stream_handler.setLevel(level)
     file_handler.setLevel(level)
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+
+
+def set_log_sampling(sample_rates: dict, payload_max_len: int = None):
+    """
+    设置热路径日志的采样率和截断长度
+    :param sample_rates: 各类日志的采样率，例如 {"request": 1.0, "event": 0.1}，1 表示全部输出，0 表示不输出
+    :param payload_max_len: 日志参数中字符串的最大长度，超出部分会被截断
+    """
+    global log_payload_max_len
+    log_sample_rates.clear()
+    log_sample_rates.update(sample_rates or {})
+    log_sample_counters.clear()
+    if payload_max_len is not None:
+        log_payload_max_len = payload_max_len
+
+
+def truncate_payload(obj, max_len: int):
+    """递归截断日志参数中的长字符串，base64 数据只保留开头。"""
+    if isinstance(obj, str):
+        if obj.startswith(("base64://", "data:")) and len(obj) > 64:
+            return f"{obj[:32]}...<{len(obj)} chars>"
+        if len(obj) > max_len:
+            return f"{obj[:max_len]}...<{len(obj)} chars>"
+        return obj
+    if isinstance(obj, dict):
+        return {key: truncate_payload(value, max_len) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [truncate_payload(value, max_len) for value in obj]
+    return obj
+
+
+class Payload:
+    """
+    延迟格式化的日志参数，配合 %s 占位符使用：
+    只有日志真正被输出时才会转为字符串，并截断 base64 等超长字段。
+
+    >>> logger.debug("收到请求: %s", Payload(req))
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        return str(truncate_payload(self.obj, log_payload_max_len))
+
+
+def log_sampled(category: str, level: int, msg: str, *args):
+    """
+    按类别采样输出热路径日志。级别未开启时直接返回，不做任何格式化。
+    采样率为 r 时每 round(1/r) 条输出一条。
+    """
+    if not logger.isEnabledFor(level):
+        return
+    rate = log_sample_rates.get(category, 1.0)
+    if rate < 1:
+        if rate <= 0:
+            return
+        count = log_sample_counters.get(category, 0)
+        log_sample_counters[category] = count + 1
+        if count % round(1 / rate) != 0:
+            return
+    logger.log(level, msg, *args, stacklevel=2)
 
 
 # 示例函数用于测试日志输出中的函数名称
@@ -2,11 +2,14 @@ import os
 import shutil
 import asyncio
 from notify_auto import message_monitor, set_config, init_auto
-from autobot_rws import run_reverse_websocket
-from log_config import set_logger_level
+from autobot_rws import ReverseWebSocketProtocol, JSON_CODEC, journal_events, merge_event_frames, run_reverse_websocket
+from onebot_server import serve_forward_websocket, serve_http_api
+from event_journal import EventJournal
+from send_queue import send_queue
+from worker_pool import WorkerPool
+from log_config import logger, set_logger_level, set_log_sampling
 import yaml
 
-# TODO 使用 xdotool 获取 QQ 窗口句柄和位置，并自动定位
 # TODO 自动爬取 QQ 群成员列表和 QQ 好友/群列表
 # TODO 修复 jmcomic 的页面顺序问题
 # TODO 部署到 VirtualBox 上 / 拥有 GUI 的 Docker 容器上
@@ -14,6 +17,17 @@ import yaml
 # TODO 将 AutoBot 上传到 PyPI 上
 
 
+async def supervise(name: str, func, restart_delay: float = 5.0):
+    """运行后台任务 func，异常退出或意外结束时记录日志并在 restart_delay 秒后重新启动。"""
+    while True:
+        try:
+            await func()
+            logger.error(f"{name} 意外结束，{restart_delay} 秒后重新启动")
+        except Exception as e:
+            logger.exception(f"{name} 异常退出: {e}，{restart_delay} 秒后重新启动")
+        await asyncio.sleep(restart_delay)
+
+
 async def main():
     if not os.path.exists("data/config.yaml"):
         shutil.copyfile("config.default.yaml", "data/config.yaml")
@@ -29,16 +43,47 @@ async def main():
         os.makedirs(TEMP_DIR, exist_ok=True)
 
     set_logger_level(config["log_level"])
+    set_log_sampling(config.get("log_sampling", {}), config.get("log_payload_max_len", 512))
     set_config(config)
+    send_queue.set_config(config)
     init_auto()
-    asyncio.create_task(message_monitor())
-    await run_reverse_websocket(
-        uri=config["ws_server"],
-        bot_qid=config["self_id"],
+
+    # 反向 WebSocket 端点，可以是一个地址或者地址列表，为空时不启用
+    ws_server = config.get("ws_server") or []
+    uris = list(dict.fromkeys([ws_server] if isinstance(ws_server, str) else ws_server))
+    adapter = ReverseWebSocketProtocol(
+        uris[0] if uris else "",
+        config["self_id"],
         reconnect_delay=config["reconnect_delay"],
         ping_interval=config["ping_interval"],
         ping_timeout=config["ping_timeout"],
     )
+    # 多 QQ 实例模式：发送动作由路由器分配给各个 display 上的 QQ 实例，接收仍由当前 display 上的 QQ 负责
+    worker_pool = WorkerPool.from_config(config) if config.get("workers") else None
+    if worker_pool:
+        adapter.send_queue = worker_pool
+    logger.info(f"已注册动作：{adapter.registered_actions.keys()}，JSON 编解码器：{JSON_CODEC}")
+    journal = EventJournal(
+        config.get("event_journal_path", "data/event_journal.db"),
+        config.get("event_journal_max_events", 10000),
+        cursor_names=uris,
+        policy=config.get("EVENT_QUEUE_POLICY", "drop-oldest"),
+        merge=merge_event_frames,
+    )
+    adapter.journal = journal
+    tasks = [supervise("消息监听", message_monitor), journal_events(adapter, journal)]
+    if uris:
+        tasks.append(run_reverse_websocket(uris, adapter, journal))
+    if config.get("ws_forward_server"):
+        tasks.append(serve_forward_websocket(adapter, journal, **config["ws_forward_server"]))
+    if config.get("http_server"):
+        tasks.append(serve_http_api(adapter, **config["http_server"]))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        journal.close()
+        if worker_pool:
+            worker_pool.shutdown()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,166 @@
+import asyncio
+from typing import AsyncIterator, NamedTuple, Optional
+from log_config import logger
+
+NOTIFICATIONS_INTERFACE = "org.freedesktop.Notifications"
+NOTIFY_MATCH_RULE = f"type='method_call',interface='{NOTIFICATIONS_INTERFACE}',member='Notify'"
+
+
+class Notification(NamedTuple):
+    """一次 org.freedesktop.Notifications.Notify 调用的参数。"""
+
+    app_name: str
+    replaces_id: int
+    summary: str  # QQ 中为聊天名称
+    body: str  # QQ 中为消息内容，群聊为 "发送者：内容"
+    hints: dict
+
+
+async def native_notifications(
+    bus_address: Optional[str] = None, reconnect_interval: float = 5.0
+) -> AsyncIterator[Notification]:
+    """
+    在进程内连接会话总线（或 bus_address 指定的总线），通过 BecomeMonitor 监听所有 Notify 调用，
+    直接解码带类型的参数，不需要 dbus-monitor 和 awk 子进程，也不用再解析文本。
+    总线策略不允许 BecomeMonitor 时改用 eavesdrop 匹配规则；连接断开（例如 dbus-daemon 重启）、连接失败
+    或两种方式都被拒绝时记录日志，每隔 reconnect_interval 秒重新连接，不会抛出异常结束监听。
+    """
+    from dbus_next import Message, MessageType
+    from dbus_next.aio import MessageBus
+
+    queue: asyncio.Queue = asyncio.Queue()  # 通知，连接断开时放入 None
+
+    def on_message(message: Message):
+        if message.message_type != MessageType.METHOD_CALL:
+            return False
+        if message.interface == NOTIFICATIONS_INTERFACE and message.member == "Notify":
+            if message.signature == "susssasa{sv}i":
+                app_name, replaces_id, _, summary, body, _, hints, _ = message.body
+                hints = {key: variant.value for key, variant in hints.items()}
+                queue.put_nowait(Notification(app_name, replaces_id, summary, body, hints))
+            else:
+                logger.warning(f"无法解析的 Notify 调用，签名: {message.signature}")
+        # 监视连接不能发送任何消息，标记为已处理，阻止 dbus-next 自动回复错误
+        return True
+
+    def on_disconnect(task: asyncio.Future):
+        error = None if task.cancelled() else task.exception()
+        logger.error(f"D-Bus 监听连接已断开: {error!r}，{reconnect_interval} 秒后重新连接")
+        queue.put_nowait(None)
+
+    while True:
+        try:
+            bus = await MessageBus(bus_address=bus_address).connect()
+        except Exception as e:
+            logger.error(f"连接 D-Bus 失败: {e}，{reconnect_interval} 秒后重试")
+            await asyncio.sleep(reconnect_interval)
+            continue
+        disconnected = asyncio.ensure_future(bus.wait_for_disconnect())
+        try:
+            bus.add_message_handler(on_message)
+            reply = await bus.call(
+                Message(
+                    destination="org.freedesktop.DBus",
+                    path="/org/freedesktop/DBus",
+                    interface="org.freedesktop.DBus.Monitoring",
+                    member="BecomeMonitor",
+                    signature="asu",
+                    body=[[NOTIFY_MATCH_RULE], 0],
+                )
+            )
+            if reply.message_type == MessageType.ERROR:
+                # 总线策略不允许监视时，退回到旧式的 eavesdrop 匹配规则
+                logger.warning(f"BecomeMonitor 失败: {reply.error_name} {reply.body}，改用 eavesdrop 匹配规则")
+                reply = await bus.call(
+                    Message(
+                        destination="org.freedesktop.DBus",
+                        path="/org/freedesktop/DBus",
+                        interface="org.freedesktop.DBus",
+                        member="AddMatch",
+                        signature="s",
+                        body=[f"eavesdrop='true',{NOTIFY_MATCH_RULE}"],
+                    )
+                )
+            if reply.message_type == MessageType.ERROR:
+                logger.error(f"AddMatch 失败: {reply.error_name} {reply.body}，{reconnect_interval} 秒后重试")
+            else:
+                disconnected.add_done_callback(on_disconnect)
+                logger.info("开始监听 D-Bus 通知")
+                while True:
+                    notification = await queue.get()
+                    if notification is None:
+                        break
+                    yield notification
+        except Exception as e:
+            logger.error(f"D-Bus 通知监听出错: {e!r}，{reconnect_interval} 秒后重新连接")
+        finally:
+            disconnected.remove_done_callback(on_disconnect)
+            disconnected.cancel()
+            bus.disconnect()
+        await asyncio.sleep(reconnect_interval)
+
+
+async def dbus_monitor_notifications() -> AsyncIterator[Notification]:
+    """
+    通过 dbus-monitor | awk 子进程监听通知。只能取到应用名为 QQ 的通知的标题和内容，
+    每条通知按两行双引号中的文本解析，内容中有引号或换行时可能错位，只作为没有安装 dbus-next 时的后备。
+    """
+    command = r"""dbus-monitor "path='/org/freedesktop/Notifications',interface='org.freedesktop.Notifications',member='Notify'" \
+| stdbuf -oL awk '
+/string "QQ"/ {
+    capture = 1
+    next
+}
+/string ""/ {
+    if (capture == 1) {
+        capture = 2
+    } else {
+        capture = 0
+    }
+    next
+}
+capture == 2 && /array \[/ {
+    print buffer
+    buffer = ""
+    capture = 0
+    next
+}
+capture == 2 {
+    buffer = buffer "\n" $0
+}'
+"""
+    # 启动子进程
+    proc = await asyncio.create_subprocess_shell(
+        command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        shell=True,
+    )
+    try:
+        while True:
+            buffer = []
+            while len(buffer) < 2:
+                line = await proc.stdout.readline()
+                line = line.decode("utf-8", errors="replace").strip()
+                if not line:
+                    continue
+                line = line.split('"')[1]  # 匹配双引号内的内容
+                buffer.append(line)
+            yield Notification("QQ", 0, buffer[0], buffer[1], {})
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+
+
+def listen_notifications(method: str = "native", bus_address: Optional[str] = None) -> AsyncIterator[Notification]:
+    """按 method（native 或 dbus-monitor）选择通知监听方式，没有安装 dbus-next 时退回到 dbus-monitor。"""
+    if method == "native":
+        try:
+            import dbus_next  # noqa: F401
+
+            return native_notifications(bus_address)
+        except ImportError:
+            logger.warning("未安装 dbus-next，通知监听退回到 dbus-monitor")
+    elif method != "dbus-monitor":
+        logger.warning(f"未知的通知监听方式: {method}，使用 dbus-monitor")
+    return dbus_monitor_notifications()
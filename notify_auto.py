@@ -2,9 +2,6 @@ import os
 import re
 import random
 import time
-import asyncio
-import pyautogui
-import pyperclip
 import subprocess
 import tui
 import atexit
@@ -13,20 +10,62 @@ import pybase64
 import mimetypes
 import magic
 import shutil
-from log_config import logger
-from typing import Literal, Optional
+import logging
+import functools
+import itertools
+import log_config
+from log_config import logger, log_sampled, Payload
+from gui_executor import gui_executor
+from adaptive_wait import adaptive_waiter
+from input_backend import create_input_backend
+from clipboard import create_clipboard
+from window_manager import window_manager
+from sidebar_index import sidebar_index
+from send_confirm import send_confirmer
+from notification_listener import listen_notifications
+from dedup_cache import DedupCache
+from notify_parser import parse_notification
+from sender_index import sender_index
+from inbound_queue import BoundedEventQueue
+from typing import List, Literal, NamedTuple, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 
 # 等待时间
 WAIT_TIME = 0.5
 SMALL_WAIT_TIME = 0.05
 LOCATE_METHOD = "absolute"
-SCREEN_SIZE = pyautogui.size()
+SCREEN_SIZE = None  # 由输入后端在 set_config 中获取
 QQ_WINDOW_POS = (640, 800)
 QQ_INPUT_POS = (862, 1455)
 OTHER_WINDOW_POS = (1960, 800)
+# QQ 窗口所在的屏幕区域 (left, top, width, height)，自适应等待在这里检测界面变化
+# 未配置时为屏幕左半边
+QQ_WINDOW_REGION = None
+QQ_INPUT_REGION = None
+# 最近聊天列表和聊天标题所在的屏幕区域 (left, top, width, height)，用于不经搜索直接点击打开最近的聊天
+SIDEBAR_REGION = None
+CHAT_TITLE_REGION = None
+# 发送确认检测新消息的聊天区域，未配置时取输入框上方的一条
+CHAT_AREA_REGION = None
+# LOCATE_METHOD 为 window 时，QQ_WINDOW_POS 和 QQ_INPUT_POS 是相对 QQ 窗口的比例，窗口移动或缩放后重新计算
+QQ_WINDOW_LAYOUT = {"QQ_WINDOW_POS": (0.5, 0.5), "QQ_INPUT_POS": (0.5, 0.9)}
 TEMP_DIR = "./temp"
 ASTRBOT_DATA_DIR = "./"
 NOTIFICATION_REPEAT_COUNT = 2
+# 通知监听方式：native（进程内 D-Bus 监视连接，需要 dbus-next）或 dbus-monitor（dbus-monitor | awk 子进程）
+NOTIFY_LISTENER = "native"
+# 键鼠输入后端：pyautogui、xdotool 或 recording（只记录不执行，用于无界面的基准测试）
+INPUT_BACKEND = "pyautogui"
+# 剪贴板后端：xlib（进程内常驻的剪贴板所有者）、xclip 或 recording
+CLIPBOARD_BACKEND = "xlib"
+# 连续的多张图片（或多个文件）合并为一个 text/uri-list 一次粘贴
+ATTACHMENT_BATCH = True
+# 并行准备（下载、解码、复制）附件的线程数
+ATTACHMENT_STAGE_WORKERS = 4
+# QQ 单条消息的文本长度上限，超出的文本按句子切分为多条消息发送，0 表示不切分
+TEXT_CHUNK_LIMIT = 3000
+# 切分后相邻两条消息之间的间隔，单位为秒
+TEXT_CHUNK_INTERVAL = 0.2
 
 # 聊天信息
 self_id = 1950154414
@@ -56,7 +95,19 @@ def set_config(config: dict):
     global self_id, self_name, chat_info
     global WAIT_TIME, SMALL_WAIT_TIME, TEMP_DIR, ASTRBOT_DATA_DIR
     global QQ_WINDOW_POS, QQ_INPUT_POS, OTHER_WINDOW_POS, LOCATE_METHOD, NOTIFICATION_REPEAT_COUNT
+    global QQ_WINDOW_REGION, QQ_INPUT_REGION, QQ_WINDOW_LAYOUT, INPUT_BACKEND, input_backend
+    global SIDEBAR_REGION, CHAT_TITLE_REGION, CHAT_AREA_REGION, SCREEN_SIZE, CLIPBOARD_BACKEND, clipboard
+    global ATTACHMENT_BATCH, ATTACHMENT_STAGE_WORKERS, TEXT_CHUNK_LIMIT, TEXT_CHUNK_INTERVAL, NOTIFY_LISTENER
     global chat_id2chat_name, chat_name2chat_type, chat_name2chat_id, chat_id2chat_type
+    # 输入后端和剪贴板在第一次 set_config 时才创建，导入本模块不需要 X 会话
+    if input_backend is None or config.get("INPUT_BACKEND", INPUT_BACKEND) != INPUT_BACKEND:
+        INPUT_BACKEND = config.get("INPUT_BACKEND", INPUT_BACKEND)
+        input_backend = create_input_backend(INPUT_BACKEND)
+    if clipboard is None or config.get("CLIPBOARD_BACKEND", CLIPBOARD_BACKEND) != CLIPBOARD_BACKEND:
+        CLIPBOARD_BACKEND = config.get("CLIPBOARD_BACKEND", CLIPBOARD_BACKEND)
+        clipboard = create_clipboard(CLIPBOARD_BACKEND)
+    logger.debug("输入后端: %s，剪贴板: %s", input_backend.name, clipboard.name)
+    SCREEN_SIZE = input_backend.size()
     self_id = config.get("self_id", self_id)
     self_name = config.get("self_name", self_name)
     chat_info = config.get("chat_info", chat_info)
@@ -66,34 +117,128 @@ def set_config(config: dict):
     QQ_WINDOW_POS = config.get("QQ_WINDOW_POS", QQ_WINDOW_POS)
     QQ_INPUT_POS = config.get("QQ_INPUT_POS", QQ_INPUT_POS)
     OTHER_WINDOW_POS = config.get("OTHER_WINDOW_POS", OTHER_WINDOW_POS)
-    if LOCATE_METHOD == "relative":
+    QQ_WINDOW_REGION = config.get("QQ_WINDOW_REGION", QQ_WINDOW_REGION) or (0, 0, SCREEN_SIZE.width // 2, SCREEN_SIZE.height)
+    SIDEBAR_REGION = config.get("SIDEBAR_REGION", SIDEBAR_REGION)
+    CHAT_TITLE_REGION = config.get("CHAT_TITLE_REGION", CHAT_TITLE_REGION)
+    CHAT_AREA_REGION = config.get("CHAT_AREA_REGION", CHAT_AREA_REGION)
+    if LOCATE_METHOD == "window":
+        QQ_WINDOW_LAYOUT = {
+            "QQ_WINDOW_POS": QQ_WINDOW_POS,
+            "QQ_INPUT_POS": QQ_INPUT_POS,
+            "SIDEBAR_REGION": SIDEBAR_REGION,
+            "CHAT_TITLE_REGION": CHAT_TITLE_REGION,
+            "CHAT_AREA_REGION": CHAT_AREA_REGION,
+        }
+    # window 模式在找到 QQ 窗口之前按整个屏幕计算
+    if LOCATE_METHOD in ("relative", "window"):
         QQ_WINDOW_POS = (int(SCREEN_SIZE.width * QQ_WINDOW_POS[0]), int(SCREEN_SIZE.height * QQ_WINDOW_POS[1]))
         QQ_INPUT_POS = (int(SCREEN_SIZE.width * QQ_INPUT_POS[0]), int(SCREEN_SIZE.height * QQ_INPUT_POS[1]))
         OTHER_WINDOW_POS = (int(SCREEN_SIZE.width * OTHER_WINDOW_POS[0]), int(SCREEN_SIZE.height * OTHER_WINDOW_POS[1]))
+        screen = (0, 0, SCREEN_SIZE.width, SCREEN_SIZE.height)
+        if "QQ_WINDOW_REGION" in config:
+            QQ_WINDOW_REGION = scale_region(QQ_WINDOW_REGION, screen)
+        SIDEBAR_REGION = SIDEBAR_REGION and scale_region(SIDEBAR_REGION, screen)
+        CHAT_TITLE_REGION = CHAT_TITLE_REGION and scale_region(CHAT_TITLE_REGION, screen)
+        CHAT_AREA_REGION = CHAT_AREA_REGION and scale_region(CHAT_AREA_REGION, screen)
         logger.debug(
             f"QQ_WINDOW_POS: {QQ_WINDOW_POS}, QQ_INPUT_POS: {QQ_INPUT_POS}, OTHER_WINDOW_POS: {OTHER_WINDOW_POS}"
         )
+    # 输入框区域：QQ 窗口宽度、以输入框位置为中心、高 80 像素的横条
+    QQ_INPUT_REGION = (QQ_WINDOW_REGION[0], max(0, QQ_INPUT_POS[1] - 40), QQ_WINDOW_REGION[2], 80)
+    adaptive_waiter.enabled = config.get("ADAPTIVE_WAIT", adaptive_waiter.enabled)
+    sidebar_index.enabled = config.get("SIDEBAR_INDEX", sidebar_index.enabled)
+    sidebar_index.region = SIDEBAR_REGION
+    sidebar_index.title_region = CHAT_TITLE_REGION
+    sidebar_index.row_height = config.get("SIDEBAR_ROW_HEIGHT", sidebar_index.row_height)
+    sidebar_index.pinned_rows = config.get("SIDEBAR_PINNED_ROWS", sidebar_index.pinned_rows)
+    send_confirmer.enabled = config.get("SEND_CONFIRM", send_confirmer.enabled)
+    send_confirmer.timeout = config.get("SEND_CONFIRM_TIMEOUT", send_confirmer.timeout)
+    window_manager.enabled = config.get("WINDOW_TARGETING", window_manager.enabled) or LOCATE_METHOD == "window"
+    window_manager.name = config.get("QQ_WINDOW_NAME", window_manager.name)
+    window_manager.pid = config.get("QQ_WINDOW_PID", window_manager.pid)
+    if window_manager.enabled and window_manager.refresh(force=True):
+        apply_window_geometry(window_manager.geometry)
     TEMP_DIR = config.get("TEMP_DIR", TEMP_DIR)
     ASTRBOT_DATA_DIR = config.get("ASTRBOT_DATA_DIR", ASTRBOT_DATA_DIR)
     NOTIFICATION_REPEAT_COUNT = config.get("NOTIFICATION_REPEAT_COUNT", NOTIFICATION_REPEAT_COUNT)
+    NOTIFY_LISTENER = config.get("NOTIFY_LISTENER", NOTIFY_LISTENER)
+    notification_dedup.repeat_count = NOTIFICATION_REPEAT_COUNT
+    notification_dedup.window = config.get("NOTIFICATION_DEDUP_WINDOW", notification_dedup.window)
+    notification_dedup.max_size = config.get("NOTIFICATION_DEDUP_MAX_SIZE", notification_dedup.max_size)
+    ATTACHMENT_BATCH = config.get("ATTACHMENT_BATCH", ATTACHMENT_BATCH)
+    ATTACHMENT_STAGE_WORKERS = config.get("ATTACHMENT_STAGE_WORKERS", ATTACHMENT_STAGE_WORKERS)
+    TEXT_CHUNK_LIMIT = config.get("TEXT_CHUNK_LIMIT", TEXT_CHUNK_LIMIT)
+    TEXT_CHUNK_INTERVAL = config.get("TEXT_CHUNK_INTERVAL", TEXT_CHUNK_INTERVAL)
     chat_id2chat_name, chat_name2chat_type, chat_name2chat_id, chat_id2chat_type = create_mapping(chat_info)
+    # 群成员索引在第一次查找时才打开数据库，GUI 工作进程中不会用到
+    sender_index.set_path(config.get("sender_index_path", sender_index.path))
+    sender_index.seeds = config.get("group_members") or {}
+    sender_index.fallback = {name: int(chat_id) for name, chat_id in chat_name2chat_id.items() if str(chat_id).isdigit()}
+    event_queue.set_config(config)
 
 
 chat_id2chat_name, chat_name2chat_type, chat_name2chat_id, chat_id2chat_type = create_mapping(chat_info)
-event_queue = asyncio.Queue()
+# 上报事件队列，有容量上限，满时按 EVENT_QUEUE_POLICY 处理
+event_queue = BoundedEventQueue()
 send_message_id = random.randint(0, 99999999)
 receive_message_id = random.randint(100000000, 199999999)
 current_chat = None
+# 重复通知的去重缓存
+notification_dedup = DedupCache(NOTIFICATION_REPEAT_COUNT)
+input_text_length = 0  # 输入框中已粘贴、尚未发送的文本长度
+# 所有键鼠操作都通过输入后端完成，后端不插入隐式延迟，需要的等待在各个 qq_* 函数中显式给出
+input_backend = None
+clipboard = None
 
 
 def enable_log(func):
+    name = func.__name__
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        logger.debug(f"执行函数: {func.__name__}")
+        # 未开启 DEBUG 时只有一次布尔判断，不做任何格式化
+        if log_config.debug_enabled:
+            logger.debug("执行函数: %s", name)
         return func(*args, **kwargs)
 
     return wrapper
 
 
+def scale_region(region, reference):
+    """把按比例表示的区域换算为屏幕坐标，reference 为参照的 (left, top, width, height)。"""
+    left, top, width, height = reference
+    return (
+        left + int(width * region[0]),
+        top + int(height * region[1]),
+        int(width * region[2]),
+        int(height * region[3]),
+    )
+
+
+def apply_window_geometry(geometry):
+    """QQ 窗口移动或缩放后，按窗口的新位置重新计算点击坐标和自适应等待的检测区域。"""
+    global QQ_WINDOW_POS, QQ_INPUT_POS, QQ_WINDOW_REGION, QQ_INPUT_REGION, CHAT_AREA_REGION
+    if LOCATE_METHOD != "window":
+        return
+    left, top, width, height = geometry
+    x, y = QQ_WINDOW_LAYOUT["QQ_WINDOW_POS"]
+    QQ_WINDOW_POS = (left + int(width * x), top + int(height * y))
+    x, y = QQ_WINDOW_LAYOUT["QQ_INPUT_POS"]
+    QQ_INPUT_POS = (left + int(width * x), top + int(height * y))
+    QQ_WINDOW_REGION = tuple(geometry)
+    QQ_INPUT_REGION = (left, max(0, QQ_INPUT_POS[1] - 40), width, 80)
+    if QQ_WINDOW_LAYOUT.get("SIDEBAR_REGION"):
+        sidebar_index.region = scale_region(QQ_WINDOW_LAYOUT["SIDEBAR_REGION"], geometry)
+    if QQ_WINDOW_LAYOUT.get("CHAT_TITLE_REGION"):
+        sidebar_index.title_region = scale_region(QQ_WINDOW_LAYOUT["CHAT_TITLE_REGION"], geometry)
+    if QQ_WINDOW_LAYOUT.get("CHAT_AREA_REGION"):
+        CHAT_AREA_REGION = scale_region(QQ_WINDOW_LAYOUT["CHAT_AREA_REGION"], geometry)
+    logger.debug(f"QQ_WINDOW_POS: {QQ_WINDOW_POS}, QQ_INPUT_POS: {QQ_INPUT_POS}, QQ_WINDOW_REGION: {QQ_WINDOW_REGION}")
+
+
+window_manager.on_change(apply_window_geometry)
+
+
 @enable_log
 def get_image_extension(decoded_bytes: bytes) -> str:
     """
@@ -179,7 +324,7 @@ def save_base64_data(b64_string: str, output_dir="./", filename="file", extensio
 def init_auto():
     # 初始化自动化环境
     os.makedirs(TEMP_DIR, exist_ok=True)
-    pyperclip.copy("")
+    clipboard.copy_text("")
     # 设置 gsettings set org.gnome.desktop.interface enable-animations false
     subprocess.run(["gsettings", "set", "org.gnome.desktop.interface", "enable-animations", "false"], check=True)
     atexit.register(close_auto)
@@ -191,20 +336,37 @@ def close_auto():
     subprocess.run(["gsettings", "set", "org.gnome.desktop.interface", "enable-animations", "true"], check=True)
 
 
+temp_file_counter = itertools.count()
+
+
+def staging_dir() -> str:
+    """
+    为一个附件创建独立的临时子目录。并行准备的附件可能同名（例如 a/img.png 和 b/img.png），
+    放在各自的目录中不会互相覆盖，文件名也保持不变（发送文件时 QQ 显示的就是文件名）。
+    """
+    path = os.path.join(TEMP_DIR, f"{os.getpid()}_{next(temp_file_counter)}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def file_uri(file_path) -> str:
+    return f"file://{os.path.abspath(file_path)}"
+
+
 @enable_log
-def copy_file_to_clipboard(file_path, file_name=None):
+def stage_file(file_path, file_name=None) -> str:
+    """把要发送的文件（网络地址、本地路径或 base64）准备到临时目录，返回临时文件的路径。"""
     os.makedirs(TEMP_DIR, exist_ok=True)
     if file_path.startswith("http"):
         # 网络路径
-        temp_file = tui.download_file(file_path, os.path.join(TEMP_DIR, file_name) if file_name else TEMP_DIR)
-        file_uri = f"file://{os.path.abspath(temp_file)}"
+        temp_dir = staging_dir()
+        temp_file = tui.download_file(file_path, os.path.join(temp_dir, file_name) if file_name else temp_dir)
     elif file_path.startswith("file://"):
         # 本地路径
         # file_uri = file_path
         # 复制文件到临时目录
-        temp_file = os.path.join(TEMP_DIR, file_name if file_name else os.path.basename(file_path))
+        temp_file = os.path.join(staging_dir(), file_name if file_name else os.path.basename(file_path))
         shutil.copy(file_path[7:], temp_file)
-        file_uri = f"file://{os.path.abspath(temp_file)}"
     elif file_path.startswith("base64://") or file_path.startswith("data:"):
         # 将 base64 编码转换为文件
         # if file_path.startswith("base64://"):
@@ -221,20 +383,22 @@ def copy_file_to_clipboard(file_path, file_name=None):
         #         raise ValueError("无效的 data URI 格式")
         # with open(temp_file, "wb") as f:
         #     f.write(base64.b64decode(base64code))
-        temp_file = save_base64_data(file_path, TEMP_DIR, f"temp_{int(time.time())}")
-        file_uri = f"file://{os.path.abspath(temp_file)}"
+        # 并行准备附件时同一秒内可能有多个文件，加上序号避免重名
+        temp_file = save_base64_data(file_path, TEMP_DIR, f"temp_{int(time.time())}_{next(temp_file_counter)}")
     else:
         # 验证文件存在性
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"文件不存在: {file_path}")
-        temp_file = os.path.join(TEMP_DIR, file_name if file_name else os.path.basename(file_path))
+        temp_file = os.path.join(staging_dir(), file_name if file_name else os.path.basename(file_path))
         shutil.copy(file_path, temp_file)
-        file_uri = f"file://{os.path.abspath(temp_file)}"
+    return temp_file
 
-    # 使用 xclip 写入剪贴板
-    subprocess.run(
-        ["xclip", "-selection", "clipboard", "-t", "text/uri-list"], input=file_uri.encode("utf-8"), check=True
-    )
+
+@enable_log
+def copy_file_to_clipboard(file_path, file_name=None):
+    temp_file = stage_file(file_path, file_name)
+    # 以 text/uri-list 格式写入剪贴板
+    clipboard.copy_uri_list([file_uri(temp_file)])
     return temp_file
 
 
@@ -256,49 +420,65 @@ def safe_file_name(file_name):
 
 
 @enable_log
-def safe_copy_file(file_path, file_name=None) -> Optional[str]:
+def safe_stage_file(file_path, file_name=None) -> Optional[str]:
     try:
         if file_name:
             file_name = safe_file_name(file_name)
-        temp_file = copy_file_to_clipboard(file_path, file_name)
-        logger.debug(f"成功复制到剪贴板: {temp_file}")
+        temp_file = stage_file(file_path, file_name)
+        logger.debug("成功准备文件: %s", temp_file)
         return temp_file
     except FileNotFoundError as e:
         logger.error(f"错误: {str(e)}")
-    except subprocess.CalledProcessError:
-        logger.error("xclip 执行失败，请确保已安装")
     except Exception as e:
         logger.error(f"未知错误: {str(e)}")
     return None
 
 
+def safe_stage_files(files: List[Tuple[str, Optional[str]]]) -> List[Optional[str]]:
+    """并行准备多个 (file_path, file_name)，返回对应的临时文件路径，失败的为 None。"""
+    if len(files) == 1:
+        return [safe_stage_file(*files[0])]
+    with ThreadPoolExecutor(min(len(files), ATTACHMENT_STAGE_WORKERS), thread_name_prefix="autobot-stage") as executor:
+        return list(executor.map(lambda item: safe_stage_file(*item), files))
+
+
 @enable_log
 def qq_window_enter():
     """QQ 窗口按下回车键。"""
-    pyautogui.press("enter")
-    time.sleep(WAIT_TIME)
+    with adaptive_waiter.wait("window_enter", QQ_WINDOW_REGION, WAIT_TIME):
+        input_backend.press("enter")
 
 
 @enable_log
 def qq_open(chat_name):
     """打开指定聊天窗口。"""
     global current_chat
-    logger.debug(f"打开指定聊天窗口: {chat_name}")
-    pyautogui.click(*QQ_WINDOW_POS, button="left")
-    time.sleep(SMALL_WAIT_TIME)
+    logger.debug("打开指定聊天窗口: %s", chat_name)
+    # 优先按窗口句柄激活 QQ（已在前台时什么都不做），找不到窗口时退回到点击
+    if not window_manager.activate():
+        input_backend.run([("click", *QQ_WINDOW_POS), ("sleep", SMALL_WAIT_TIME)])
 
     if current_chat == chat_name:
         return
 
-    # 打开指定聊天窗口
-    pyautogui.hotkey("ctrl", "f")
-    time.sleep(SMALL_WAIT_TIME)
-    pyautogui.typewrite(chat_name)
-    time.sleep(WAIT_TIME)
-    time.sleep(SMALL_WAIT_TIME)
-    time.sleep(SMALL_WAIT_TIME)
-    pyautogui.press("enter")
-    time.sleep(SMALL_WAIT_TIME)
+    # 聊天在最近聊天列表中时直接点击打开，点击后确认标题，不一致时退回到搜索
+    position = sidebar_index.locate(chat_name)
+    if position:
+        with adaptive_waiter.wait("sidebar_switch", QQ_WINDOW_REGION, WAIT_TIME, settle=True):
+            input_backend.click(*position)
+        if sidebar_index.verify(chat_name):
+            current_chat = chat_name
+            return
+
+    # 打开指定聊天窗口：等待搜索弹窗出现、搜索结果刷新完成、聊天切换完成
+    with adaptive_waiter.wait("search_popup", QQ_WINDOW_REGION, SMALL_WAIT_TIME):
+        input_backend.hotkey("ctrl", "f")
+    # 输入的搜索词本身就会引起画面变化，检测不到结果是否已经加载完，配置的等待时间作为下限
+    search_wait = WAIT_TIME + 2 * SMALL_WAIT_TIME
+    with adaptive_waiter.wait("search_results", QQ_WINDOW_REGION, search_wait, settle=True, floor=search_wait):
+        input_backend.typewrite(chat_name)
+    with adaptive_waiter.wait("chat_switch", QQ_WINDOW_REGION, SMALL_WAIT_TIME, settle=True):
+        input_backend.press("enter")
     current_chat = chat_name
 
 
@@ -306,68 +486,181 @@ def qq_open(chat_name):
 def qq_close():
     """关闭 QQ 窗口。"""
     time.sleep(SMALL_WAIT_TIME)
-    pyautogui.click(*OTHER_WINDOW_POS, button="left")
+    # 优先切回之前的前台窗口，QQ 已经不在前台时什么都不做
+    if not window_manager.deactivate():
+        input_backend.click(*OTHER_WINDOW_POS)
 
 
 @enable_log
 def qq_input_init():
     """进入输入模式。"""
-    pyautogui.click(*QQ_INPUT_POS, button="left")
-    # time.sleep(SMALL_WAIT_TIME)
+    # 等待输入框获得焦点后再粘贴
+    input_backend.run([("click", *QQ_INPUT_POS), ("sleep", SMALL_WAIT_TIME)])
+
+
+@enable_log
+def qq_input_clear():
+    """清空输入框中未发出的内容，用于一条消息发送失败后继续发送下一条。"""
+    global input_text_length
+    input_backend.run([("click", *QQ_INPUT_POS), ("hotkey", "ctrl", "a"), ("press", "delete"), ("sleep", SMALL_WAIT_TIME)])
+    input_text_length = 0
 
 
 @enable_log
 def qq_input_send():
     """发送消息。"""
-    pyautogui.hotkey("ctrl", "enter")
-    time.sleep(SMALL_WAIT_TIME)
+    global input_text_length
+    # 等待输入框被清空
+    with adaptive_waiter.wait("input_cleared", QQ_INPUT_REGION, SMALL_WAIT_TIME):
+        input_backend.hotkey("ctrl", "enter")
+    input_text_length = 0
+
+
+def chat_area_region():
+    """发送确认检测的区域：配置的 CHAT_AREA_REGION，或者 QQ 窗口中输入框上方 160 像素高的一条（新消息出现的位置）。"""
+    if CHAT_AREA_REGION:
+        return CHAT_AREA_REGION
+    top = max(QQ_WINDOW_REGION[1], QQ_INPUT_REGION[1] - 160)
+    return (QQ_WINDOW_REGION[0], top, QQ_WINDOW_REGION[2], QQ_INPUT_REGION[1] - top)
 
 
 @enable_log
 def qq_input_text(text):
     """输入文本。"""
+    global input_text_length
     # pyautogui.typewrite(text)
-    pyperclip.copy(text)
-    pyautogui.hotkey("ctrl", "v")
-    # time.sleep(SMALL_WAIT_TIME)
+    clipboard.copy_text(text)
+    # 输入后端不会在每步之后隐式等待，等粘贴完成后再进行下一步或发送
+    input_backend.run([("hotkey", "ctrl", "v"), ("sleep", SMALL_WAIT_TIME)])
+    input_text_length += len(text)
+
+
+# 切分长文本时依次尝试的断点：换行、句末标点、逗号和空白，都找不到时按长度硬切
+TEXT_BREAK_PATTERNS = (
+    re.compile(r"\n"),
+    re.compile(r"[。！？!?；;…]+[”’」』）)\"']*|\.(?=\s)"),
+    re.compile(r"[，,、\s]"),
+)
+
+
+def split_text(text: str, limit: int) -> List[str]:
+    """把文本切分为不超过 limit 个字符的片段，尽量在后半段的句子边界处断开。"""
+    chunks = []
+    while len(text) > limit:
+        window = text[:limit]
+        cut = limit
+        for pattern in TEXT_BREAK_PATTERNS:
+            ends = [match.end() for match in pattern.finditer(window, limit // 2)]
+            if ends:
+                cut = ends[-1]
+                break
+        chunk = text[:cut].rstrip()
+        if chunk:
+            chunks.append(chunk)
+        text = text[cut:].lstrip("\n")
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+@enable_log
+def qq_input_long_text(text) -> int:
+    """
+    输入可能超过 QQ 单条消息长度上限的文本。放不进当前输入框时，先发送输入框中已有的内容，
+    再把文本按句子切分，前面的片段逐条粘贴并立即发送，最后一段留在输入框中。
+    返回因切分而提前发送的消息数。
+    """
+    if not TEXT_CHUNK_LIMIT or input_text_length + len(text) <= TEXT_CHUNK_LIMIT:
+        qq_input_text(text)
+        return 0
+    sends = 0
+    if input_text_length:
+        qq_input_send()
+        time.sleep(TEXT_CHUNK_INTERVAL)
+        sends += 1
+    chunks = split_text(text, TEXT_CHUNK_LIMIT)
+    logger.debug("长文本 %s 字，切分为 %s 条消息", len(text), len(chunks))
+    for i, chunk in enumerate(chunks):
+        if i:
+            qq_input_send()
+            time.sleep(TEXT_CHUNK_INTERVAL)
+            sends += 1
+        qq_input_text(chunk)
+    return sends
+
+
+def at_name(group_id: str, qq) -> str:
+    """
+    @ 的目标换成 QQ 中要输入的名称：配置中的名称、群成员索引中的名称（包括合成 id），
+    都查不到时原样输入。
+    """
+    qq = str(qq)
+    if qq in chat_id2chat_name:
+        return chat_id2chat_name[qq]
+    if qq.isdigit():
+        name = sender_index.name_of(group_id, int(qq))
+        if name is not None:
+            return name
+        logger.warning(f"群 {group_id} 中找不到 {qq} 的名称，按号码输入")
+    return qq
 
 
 @enable_log
 def qq_input_at(qq_name):
     """输入 @ 某人。"""
-    if qq_name == "all" or qq_name == "全体成员":
-        pyautogui.typewrite("@")
+    # 等待成员列表弹出并稳定后再回车选中
+    with adaptive_waiter.wait("at_popup", QQ_WINDOW_REGION, 3 * SMALL_WAIT_TIME, settle=True):
+        if qq_name == "all" or qq_name == "全体成员":
+            input_backend.typewrite("@")
+        else:
+            input_backend.typewrite(f"@{qq_name}")
+    input_backend.press("enter")
+
+
+def astrbot_file_path(file_path: str) -> str:
+    """把 AstrBot 发来的 /AstrBot/data 路径换成本地的 ASTRBOT_DATA_DIR。"""
+    if file_path.startswith("/AstrBot/data"):
+        file_path = file_path.replace("/AstrBot/data", ".")
+        file_path = os.path.join(ASTRBOT_DATA_DIR, file_path)
+    return file_path
+
+
+@enable_log
+def qq_input_attachments(kind: Literal["image", "file"], files: List[Tuple[str, Optional[str]]]) -> bool:
+    """
+    把多张图片或多个文件写入同一个 text/uri-list，一次粘贴输入，files 为 (file_path, file_name) 列表。
+    图片直接粘贴到输入框，文件会弹出一次发送确认框。返回是否粘贴了内容。
+    """
+    temp_files = [temp_file for temp_file in safe_stage_files(files) if temp_file]
+    if not temp_files:
+        return False
+    try:
+        clipboard.copy_uri_list([file_uri(temp_file) for temp_file in temp_files])
+    except subprocess.CalledProcessError:
+        logger.error("xclip 执行失败，请确保已安装")
+        return False
+    if kind == "image":
+        input_backend.run([("hotkey", "ctrl", "v"), ("sleep", SMALL_WAIT_TIME)])
     else:
-        pyautogui.typewrite(f"@{qq_name}")
-    time.sleep(SMALL_WAIT_TIME)
-    pyautogui.hotkey("enter")
+        # 等待发送文件的确认弹窗出现，再按住回车确认
+        with adaptive_waiter.wait("file_dialog", QQ_WINDOW_REGION, 2 * SMALL_WAIT_TIME):
+            input_backend.hotkey("ctrl", "v")
+        input_backend.run([("key_down", "enter"), ("sleep", SMALL_WAIT_TIME), ("key_up", "enter")])
+    # 1h 后删除临时文件
+    # os.remove(temp_file)
+    return True
 
 
 @enable_log
 def qq_input_image(file_path):
     """输入图片。"""
-    temp_file = safe_copy_file(file_path)
-    if not temp_file:
-        return
-    pyautogui.hotkey("ctrl", "v")
-    time.sleep(SMALL_WAIT_TIME)
+    qq_input_attachments("image", [(file_path, None)])
 
 
 @enable_log
 def qq_send_file(file_path, file_name=None):
     """输入文件。"""
-    if file_path.startswith("/AstrBot/data"):
-        file_path = file_path.replace("/AstrBot/data", ".")
-        file_path = os.path.join(ASTRBOT_DATA_DIR, file_path)
-    temp_file = safe_copy_file(file_path, file_name)
-    if not temp_file:
-        return
-    pyautogui.hotkey("ctrl", "v")
-    pyautogui.keyDown("enter")
-    time.sleep(SMALL_WAIT_TIME)
-    pyautogui.keyUp("enter")
-    # 1h 后删除临时文件
-    # os.remove(temp_file)
+    qq_input_attachments("file", [(astrbot_file_path(file_path), file_name)])
 
 def unescape_node_message(message: str) -> str:
     """
@@ -379,65 +672,139 @@ def unescape_node_message(message: str) -> str:
     return message.replace("&amp;", "&").replace("&#91;", "[").replace("&#93;", "]").replace("&#44;", ",")
 
 @enable_log
-def qq_send_message(message_type: Literal["group", "private"], chat_id: str, message: list):
-    """将 msg 发送给 to 指定的对象。"""
-    global send_message_id
-    chat_id = str(chat_id)
-    logger.debug(f"发送消息: {chat_id}, {message}")
-    if not isinstance(message, list):
-        logger.error(f"消息格式错误, chat_name: {chat_id}, message: {message}")
-        return None
-    try:
-        qq_open(chat_id)
-        qq_input_init()
-        text_gather = ""
-        has_input_text = False
-        for item in message:
-            if item["type"] == "text":
-                text_gather += item["data"]["text"].strip()
+def qq_input_message(message_type: Literal["group", "private"], chat_id: str, message: list) -> Tuple[bool, int]:
+    """
+    在已打开的聊天窗口中输入一条消息的所有消息段。
+    返回输入框中是否有待发送的内容，以及长文本切分时已经提前发送的消息数。
+    """
+    text_gather: List[str] = []  # 连续的文本消息段，输入前一次拼接
+    has_input_text = False
+    sends = 0
+    i = 0
+    while i < len(message):
+        item = message[i]
+        i += 1
+        if item["type"] == "text":
+            text_gather.append(item["data"]["text"].strip())
+            has_input_text = True
+            continue
+        # 自定义节点类型
+        elif item['type'] == 'node':
+            if isinstance(item['data']['content'], str):
+                # 为 str 时只有一条消息，等同于 text 类型
+                # text_gather += item['data']['content'].strip()
+                text_gather.append(unescape_node_message(item['data']['content'].strip()))
                 has_input_text = True
-                continue
-            # 自定义节点类型
-            elif item['type'] == 'node':
-                if isinstance(item['data']['content'], str):
-                    # 为 str 时只有一条消息，等同于 text 类型
-                    # text_gather += item['data']['content'].strip()
-                    text_gather += unescape_node_message(item['data']['content'].strip())
-                    has_input_text = True
-                else:
-                    # 可能为 list , 但这里不做处理
-                    logger.warning(f"不支持的消息类型: {item}")
-                continue
-            elif item["type"] == "json":
-                text_gather += item["data"]["data"].strip()
+            else:
+                # 可能为 list , 但这里不做处理
+                logger.warning("不支持的消息类型: %s", Payload(item))
+            continue
+        elif item["type"] == "json":
+            text_gather.append(item["data"]["data"].strip())
+            has_input_text = True
+            continue
+        elif text_gather:
+            sends += qq_input_long_text("".join(text_gather))
+            text_gather = []
+        if item["type"] == "at":
+            if message_type == "group":
+                qq_input_at(at_name(chat_id, item["data"]["qq"]))
                 has_input_text = True
-                continue
-            elif text_gather != "":
-                qq_input_text(text_gather)
-                text_gather = ""
-            if item["type"] == "at":
-                if message_type == "group":
-                    qq_input_at(chat_id2chat_name.get(str(item["data"]["qq"]), item["data"]["qq"]))
-                    has_input_text = True
-            elif item["type"] == "image":
-                qq_input_image(item["data"]["file"])
+        elif item["type"] in ("image", "file"):
+            # 连续的同类消息段合并为一次粘贴
+            items = [item]
+            while ATTACHMENT_BATCH and i < len(message) and message[i]["type"] == item["type"]:
+                items.append(message[i])
+                i += 1
+            if item["type"] == "image":
+                qq_input_attachments("image", [(segment["data"]["file"], None) for segment in items])
                 has_input_text = True
-            elif item["type"] == "file":
-                qq_send_file(item["data"]["file"], item["data"]["name"])
-                qq_input_init()
             else:
-                logger.warning(f"不支持的消息类型: {item}")
-        if text_gather != "":
-            qq_input_text(text_gather)
-        if has_input_text:
-            qq_input_send()
-        qq_close()
+                files = [(astrbot_file_path(segment["data"]["file"]), segment["data"]["name"]) for segment in items]
+                qq_input_attachments("file", files)
+                qq_input_init()
+        else:
+            logger.warning("不支持的消息类型: %s", Payload(item))
+    if text_gather:
+        sends += qq_input_long_text("".join(text_gather))
+    return has_input_text, sends
+
+
+class SendResult(NamedTuple):
+    """一条消息的发送结果。"""
+
+    message_id: int
+    chunks: int  # 实际在 QQ 中发出的消息数，长文本被切分时大于 1
+    latency: Optional[float] = None  # 从按下发送到消息出现在聊天区域的秒数，未开启发送确认时为 None
+
+
+@enable_log
+def qq_send_messages(message_type: Literal["group", "private"], chat_id: str, messages: list) -> List[Optional[SendResult]]:
+    """
+    在一次 打开→关闭 流程中依次发送发给同一个聊天的多条消息，每条消息单独输入并按 ctrl+enter 发出，
+    在 QQ 中仍是各自独立的消息。返回与 messages 一一对应的 SendResult 列表，失败的消息为 None，
+    一条消息失败（格式错误、发送确认超时等）不影响其他消息。
+    """
+    chat_id = str(chat_id)
+    logger.debug("发送消息: %s, %s", chat_id, Payload(messages))
+    results: List[Optional[SendResult]] = [None] * len(messages)
+    valid_indexes = []
+    for i, message in enumerate(messages):
+        if not isinstance(message, list):
+            logger.error("消息格式错误, chat_name: %s, message: %s", chat_id, Payload(message))
+            continue
+        valid_indexes.append(i)
+    if not valid_indexes:
+        return results
+    try:
+        qq_open(chat_id)
     except Exception as e:
-        logger.error(f"发送消息失败, chat_name: {chat_id}, message: {message}, error: {e}")
+        logger.error(f"打开聊天窗口失败, chat_name: {chat_id}, error: {e}")
         qq_close()
-        return None
+        return results
+    for i in valid_indexes:
+        try:
+            results[i] = qq_send_opened(message_type, chat_id, messages[i])
+        except Exception as e:
+            logger.error("发送消息失败, chat_name: %s, message: %s, error: %s", chat_id, Payload(messages[i]), e)
+            qq_input_clear()
+    if any(results):
+        # 发送后该聊天移到最近聊天列表的最前面
+        sidebar_index.touch(chat_id)
+        sidebar_index.capture(chat_id)
+    qq_close()
+    return results
+
+
+@enable_log
+def qq_send_opened(message_type: Literal["group", "private"], chat_id: str, message: list) -> SendResult:
+    """
+    在已打开的聊天窗口中输入并发送一条消息。
+    开启发送确认时，发送后等待新消息出现在聊天区域，超时抛出 TimeoutError。
+    """
+    global send_message_id, input_text_length
+    qq_input_init()
+    input_text_length = 0
+    has_input_text, sends = qq_input_message(message_type, chat_id, message)
+    latency = None
+    if has_input_text:
+        region = chat_area_region()
+        baseline = send_confirmer.capture(region)
+        start = time.monotonic()
+        qq_input_send()
+        if baseline is not None:
+            latency = send_confirmer.confirm(region, baseline, start)
+            if latency is None:
+                raise TimeoutError(f"{send_confirmer.timeout} 秒内没有看到发出的消息")
     send_message_id += 1
-    return send_message_id
+    return SendResult(send_message_id, 1 + sends, latency)
+
+
+@enable_log
+def qq_send_message(message_type: Literal["group", "private"], chat_id: str, message: list):
+    """将 msg 发送给 to 指定的对象。"""
+    result = qq_send_messages(message_type, chat_id, [message])[0]
+    return result and result.message_id
 
 
 # # 同步处理消息的函数
@@ -484,93 +851,70 @@ async def get_event():
     return await event_queue.get()
 
 
+async def get_events(max_count: int = 64) -> list:
+    """
+    等待直到事件队列中至少有一个事件，然后一次性取出所有已就绪的事件（最多 max_count 个）。
+    队列为空时协程挂起，不会空转轮询。
+    """
+    global event_queue
+    events = [await event_queue.get()]
+    while len(events) < max_count and not event_queue.empty():
+        events.append(event_queue.get_nowait())
+    return events
+
+
+async def subscribe_events(max_count: int = 64):
+    """
+    订阅事件流的异步迭代器，每次唤醒产出一批已就绪的事件。
+
+    >>> async for events in subscribe_events():
+    ...     for event in events:
+    ...         ...
+    """
+    while True:
+        yield await get_events(max_count)
+
+
 async def message_monitor():
     global event_queue, chat_name2chat_type, chat_name2chat_id, receive_message_id, self_id, self_name, NOTIFICATION_REPEAT_COUNT
     """
     实时获取输出。
-    由于每条消息会重复输出2次，这里简单通过比较和去重的方式进行处理。
+    由于每条消息会重复输出 NOTIFICATION_REPEAT_COUNT 次，这里通过 notification_dedup 去重。
     """
-    command = r"""dbus-monitor "path='/org/freedesktop/Notifications',interface='org.freedesktop.Notifications',member='Notify'" \
-| stdbuf -oL awk '
-/string "QQ"/ {
-    capture = 1
-    next
-}
-/string ""/ {
-    if (capture == 1) {
-        capture = 2
-    } else {
-        capture = 0
-    }
-    next
-}
-capture == 2 && /array \[/ {
-    print buffer
-    buffer = ""
-    capture = 0
-    next
-}
-capture == 2 {
-    buffer = buffer "\n" $0
-}' 
-"""
-    # 启动子进程
-    proc = await asyncio.create_subprocess_shell(
-        command,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.DEVNULL,
-        shell=True,
-    )
+    await gui_executor.submit(qq_close)
+    # 持续读取通知
+    async for notification in listen_notifications(NOTIFY_LISTENER):
+        if notification.app_name != "QQ":
+            continue
+        logger.debug('收到消息: "%s" "%s"', notification.summary, notification.body)
 
-    hash_count = {}
-    qq_close()
-    # 持续读取输出
-    while True:
-        buffer = []
-        while len(buffer) < 2:
-            line = await proc.stdout.readline()
-            line = line.decode("utf-8", errors="replace").strip()
-            if not line:
-                continue
-            line = line.split('"')[1]  # 匹配双引号内的内容
-            buffer.append(line)
+        chat_name = notification.summary.strip()
+        notify_content: str = notification.body
 
-        logger.debug(f'收到消息: "{buffer[0]}" "{buffer[1]}"')
+        # 检查是否为有效消息
+        if notification_dedup.is_duplicate((chat_name, notify_content)):
+            continue
 
-        chat_name = buffer[0].strip()
-        notify_content: str = buffer[1]
+        message = []
+        chat_type = chat_name2chat_type.get(str(chat_name), "group")
+        logger.debug("chat_name: %s, notify_content: %s chat_type: %s", chat_name, notify_content, chat_type)
+        parsed = parse_notification(chat_type, chat_name, notify_content, self_name)
 
-        # 检查是否为有效消息
-        if NOTIFICATION_REPEAT_COUNT > 1:
-            hash_count[chat_name + notify_content] = hash_count.get(chat_name + notify_content, 0) + 1
-            if hash_count[chat_name + notify_content] >= NOTIFICATION_REPEAT_COUNT:
-                hash_count.pop(chat_name + notify_content)
-                continue
-
-        # 过滤掉无效消息："你有xx条新消息"
-        if notify_content.startswith("你有") and notify_content.endswith("条新通知"):
+        # 过滤掉无效消息："你有xx条新通知"，以及撤回、入群等没有发送者的群通知
+        if parsed is None or parsed.kind in ("summary", "system"):
             logger.debug(f"过滤掉无效消息: {notify_content}")
             continue
 
         # 过滤掉纯文本以外的消息
-        # if notify_content.startswith("[") and notify_content.endswith("]"):
+        # if parsed.placeholders and parsed.text == f"[{parsed.placeholders[0]}]":
         #     logger.debug(f"过滤掉非文本消息: {notify_content}")
         #     continue
 
-        message = []
-        chat_type = chat_name2chat_type.get(str(chat_name), "group")
-        logger.debug(f"chat_name: {chat_name}, notify_content: {notify_content} chat_type: {chat_type}")
-
-        if chat_type == "group":
-            at_flag = False
-            if notify_content.startswith("[有人@我] "):
-                notify_content = notify_content.replace("[有人@我] ", "")
-                notify_content = notify_content.replace(f"@{self_name} ", "")
-                at_flag = True
-            raw_message = notify_content.split("：", 1)[1]
-            sender_nickname = notify_content.split("：")[0]
-            sender_user_id = chat_name2chat_id.get(sender_nickname, 0)
-            if at_flag:
+        if parsed.kind == "group":
+            raw_message = parsed.text
+            sender_nickname = parsed.sender
+            sender_user_id = sender_index.resolve(chat_name2chat_id.get(chat_name, chat_name), sender_nickname)
+            if parsed.at_me:
                 message.append({"type": "at", "data": {"qq": int(self_id)}})
             event = {
                 "time": int(time.time()),
@@ -589,8 +933,8 @@ capture == 2 {
                 },
             }
         else:
-            sender_nickname = chat_name
-            raw_message = notify_content
+            sender_nickname = parsed.sender
+            raw_message = parsed.text
             event = {
                 "time": int(time.time()),
                 "post_type": "message",
@@ -607,8 +951,9 @@ capture == 2 {
             }
 
         receive_message_id += 1
-        logger.info(f"收到消息: {event}")
-        await event_queue.put(event)
+        sidebar_index.touch(str(chat_name2chat_id.get(chat_name, chat_name)))
+        log_sampled("event", logging.INFO, "收到消息: %s", Payload(event))
+        event_queue.put_nowait(event)
 
 
 # async def main():
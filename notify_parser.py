@@ -0,0 +1,43 @@
+import re
+from typing import NamedTuple, Optional, Tuple
+
+# 群聊中 @ 了自己的消息，内容前带有 "[有人@我] "
+AT_ME_PATTERN = re.compile(r"^\[有人@我\]\s*")
+# 图片、文件等非文本消息在通知中显示为占位符
+PLACEHOLDER_PATTERN = re.compile(r"\[(图片|文件|语音|视频|动画表情|表情|闪照)\]")
+
+
+class ParsedNotification(NamedTuple):
+    """解析后的 QQ 通知。"""
+
+    kind: str  # group / private / summary（"你有xx条新通知"）/ system（没有发送者的群通知，例如撤回、入群提示）
+    sender: str  # 群聊为发送者昵称，私聊为聊天名称，其他为空
+    text: str
+    at_me: bool = False
+    placeholders: Tuple[str, ...] = ()  # 内容中出现的占位符，例如 ("图片",)
+
+
+def parse_notification(chat_type: str, chat_name: str, content, self_name: str = "") -> Optional[ParsedNotification]:
+    """
+    按 QQ 通知的格式解析通知内容，chat_type 为 group 或 private。
+    内容不是字符串时返回 None，任何格式的字符串都不会抛出异常。
+    常见的格式只用 startswith / partition 判断，正则只在内容中有 "[" 时才用到。
+    """
+    if not isinstance(content, str):
+        return None
+    # "你有 3 条新通知" 之类的汇总通知，不对应具体的消息
+    if content.startswith("你有") and content.endswith("条新通知"):
+        return ParsedNotification("summary", "", content)
+    placeholders = tuple(PLACEHOLDER_PATTERN.findall(content)) if "[" in content else ()
+    if chat_type != "group":
+        return ParsedNotification("private", chat_name, content, False, placeholders)
+    at_me = content.startswith("[有人@我]")
+    if at_me:
+        content = AT_ME_PATTERN.sub("", content, 1)
+        if self_name:
+            content = content.replace(f"@{self_name} ", "")
+    # 群聊消息 "发送者：内容"，发送者取第一个全角冒号之前的部分，没有发送者的是撤回、入群等提示
+    sender, separator, text = content.partition("：")
+    if not separator or not sender or "\n" in sender:
+        return ParsedNotification("system", "", content, at_me, placeholders)
+    return ParsedNotification("group", sender, text, at_me, placeholders)
@@ -0,0 +1,212 @@
+import asyncio
+import functools
+import websockets
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qsl
+from websockets.asyncio.server import serve, ServerConnection
+from log_config import logger
+from event_journal import EventJournal
+from autobot_rws import ReverseWebSocketProtocol, receive_messages, send_hearbeat, json_loads
+
+
+def check_access_token(access_token: str, authorization: str, query: dict) -> HTTPStatus:
+    """按 OneBot 的约定校验 access_token：缺少返回 401，不匹配返回 403。"""
+    if not access_token:
+        return HTTPStatus.OK
+    token = query.get("access_token")
+    if token is None and authorization:
+        token = authorization.split(" ", 1)[-1].strip()
+    if token is None:
+        return HTTPStatus.UNAUTHORIZED
+    if token != access_token:
+        return HTTPStatus.FORBIDDEN
+    return HTTPStatus.OK
+
+
+async def forward_events(
+    websocket: ServerConnection,
+    journal: EventJournal,
+):
+    """
+    向正向 WebSocket 客户端推送事件。客户端只在内存中记录一个序号，从连接之后的事件开始推送，
+    事件直接读取事件日志中已序列化好的字符串，多个客户端之间不会重复序列化。
+    客户端落后太多时，已经不在日志中的事件（超出内存中保留的数量，或者已被删除）会被跳过并记录日志。
+    """
+    cursor = journal.last_seq
+    try:
+        while True:
+            records = journal.read_after(cursor)
+            if not records and journal.last_seq > cursor:
+                # cursor 之后的事件都已不在日志中，从最早还能读到的事件继续
+                records = journal.read_after(journal.oldest_seq() - 1)
+            next_seq = records[0][0] if records else journal.last_seq + 1
+            if next_seq > cursor + 1:
+                logger.warning(f"正向 WebSocket 客户端 {websocket.remote_address} 落后太多，跳过 {next_seq - cursor - 1} 个事件")
+                cursor = next_seq - 1
+            if not records:
+                await journal.wait_after(cursor)
+                continue
+            for seq, event in records:
+                await websocket.send(event)
+            cursor = records[-1][0]
+            # send 在缓冲区未满时不会挂起，这里让出事件循环，避免落后的客户端追赶时独占事件循环
+            await asyncio.sleep(0)
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+
+async def handle_forward_websocket(
+    websocket: ServerConnection,
+    adapter: ReverseWebSocketProtocol,
+    journal: EventJournal,
+):
+    """
+    处理一个正向 WebSocket 客户端。路径 /api 只处理动作，/event 只推送事件，其他路径两者都有。
+    """
+    path = urlsplit(websocket.request.path).path.rstrip("/")
+    remote = websocket.remote_address
+    logger.info(f"正向 WebSocket 客户端已连接：{remote}，路径：{path or '/'}")
+    tasks = []
+    if path != "/event":
+        tasks.append(asyncio.create_task(receive_messages(websocket, adapter)))
+    if path != "/api":
+        try:
+            await websocket.send(adapter.build_event_lifetime("connect"))
+        except websockets.exceptions.ConnectionClosed:
+            return
+        tasks.append(asyncio.create_task(forward_events(websocket, journal)))
+        tasks.append(asyncio.create_task(send_hearbeat(websocket, adapter, adapter.ping_interval)))
+    tasks.append(asyncio.create_task(websocket.wait_closed()))
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    logger.info(f"正向 WebSocket 客户端已断开：{remote}")
+
+
+async def serve_forward_websocket(
+    adapter: ReverseWebSocketProtocol,
+    journal: EventJournal,
+    host: str = "0.0.0.0",
+    port: int = 3001,
+    access_token: str = "",
+):
+    """正向 WebSocket 服务：OneBot 客户端主动连接到 AutoBot。"""
+
+    def process_request(connection: ServerConnection, request):
+        status = check_access_token(
+            access_token,
+            request.headers.get("Authorization", ""),
+            dict(parse_qsl(urlsplit(request.path).query)),
+        )
+        if status != HTTPStatus.OK:
+            return connection.respond(status, f"{status.phrase}\n")
+        return None
+
+    async with serve(
+        functools.partial(handle_forward_websocket, adapter=adapter, journal=journal),
+        host,
+        port,
+        process_request=process_request,
+        ping_interval=adapter.ping_interval,
+        ping_timeout=adapter.ping_timeout,
+    ) as server:
+        logger.info(f"正向 WebSocket 服务已启动：ws://{host}:{port}")
+        await server.serve_forever()
+
+
+async def handle_http_request(
+    adapter: ReverseWebSocketProtocol,
+    method: str,
+    target: str,
+    headers: dict,
+    body: bytes,
+    access_token: str = "",
+):
+    """处理一个 HTTP API 请求，返回 (状态码, 响应正文)。"""
+    url = urlsplit(target)
+    params = dict(parse_qsl(url.query))
+    status = check_access_token(access_token, headers.get("authorization", ""), params)
+    if status != HTTPStatus.OK:
+        return status, ""
+    params.pop("access_token", None)
+    if method not in ("GET", "POST"):
+        return HTTPStatus.METHOD_NOT_ALLOWED, ""
+    action = url.path.strip("/")
+    if action not in adapter.registered_actions:
+        return HTTPStatus.NOT_FOUND, ""
+    if body:
+        content_type = headers.get("content-type", "application/json")
+        try:
+            if content_type.startswith("application/json"):
+                params.update(json_loads(body))
+            elif content_type.startswith("application/x-www-form-urlencoded"):
+                params.update(parse_qsl(body.decode("utf-8")))
+            else:
+                return HTTPStatus.NOT_ACCEPTABLE, ""
+        except (ValueError, TypeError):
+            return HTTPStatus.BAD_REQUEST, ""
+    response = await adapter.parse_request({"action": action, "params": params})
+    return HTTPStatus.OK, response
+
+
+async def handle_http_client(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    adapter: ReverseWebSocketProtocol,
+    access_token: str = "",
+):
+    """处理一个 HTTP 客户端连接，支持 keep-alive，同一连接上的请求按顺序处理。"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, target, version = request_line.decode("latin-1").split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length") or 0))
+            status, payload = await handle_http_request(adapter, method, target, headers, body, access_token)
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+            content = payload.encode("utf-8")
+            writer.write(
+                (
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    "Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(content)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                    "\r\n"
+                ).encode("latin-1")
+                + content
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    except Exception as e:
+        logger.error(f"处理 HTTP 请求时发生异常: {e}")
+    finally:
+        writer.close()
+
+
+async def serve_http_api(
+    adapter: ReverseWebSocketProtocol,
+    host: str = "0.0.0.0",
+    port: int = 3000,
+    access_token: str = "",
+):
+    """HTTP API 服务：通过 GET/POST http://host:port/<action> 调用动作。"""
+    server = await asyncio.start_server(
+        functools.partial(handle_http_client, adapter=adapter, access_token=access_token),
+        host,
+        port,
+    )
+    async with server:
+        logger.info(f"HTTP API 服务已启动：http://{host}:{port}")
+        await server.serve_forever()
@@ -0,0 +1,130 @@
+import time
+import threading
+import subprocess
+from typing import Dict, List, NamedTuple, Optional
+from input_backend import InputBackend, Size, Step
+from clipboard import Clipboard
+
+
+class Operation(NamedTuple):
+    """一次被记录的操作。"""
+
+    layer: str  # input / clipboard / subprocess / sleep
+    name: str
+    detail: str
+    duration: float  # 模拟耗时（sleep 为真实耗时），单位为秒
+
+
+class Recorder:
+    """
+    无界面的 GUI 操作记录器，用于在没有 X 会话、QQ 和 xclip 的环境（例如 CI）中运行和测量完整的发送流程。
+
+    输入后端（RecordingBackend）、剪贴板（RecordingClipboard）和 install() 之后的 subprocess.run 都不会真正执行，
+    只按 durations 中的模拟耗时记录下来；time.sleep 照常执行并记录真实的等待时间。
+    simulate 为 True 时还会真实地 sleep 模拟耗时，使总耗时接近真实环境。
+    """
+
+    # 各种操作的模拟耗时（秒），type 为每个字符的耗时
+    DURATIONS = {
+        "click": 0.012,
+        "hotkey": 0.008,
+        "press": 0.006,
+        "type": 0.004,
+        "key_down": 0.003,
+        "key_up": 0.003,
+        "copy_text": 0.005,
+        "copy_uri_list": 0.015,
+        "subprocess": 0.02,
+    }
+
+    def __init__(self, durations: Optional[Dict[str, float]] = None, simulate: bool = False, screen_size=(1920, 1080)):
+        self.durations = {**self.DURATIONS, **(durations or {})}
+        self.simulate = simulate
+        self.screen_size = Size(*screen_size)
+        self.operations: List[Operation] = []
+        self._lock = threading.Lock()
+        self._real_sleep = time.sleep
+        self._real_run = subprocess.run
+
+    def record(self, layer: str, name: str, detail: str = "", duration: Optional[float] = None):
+        if duration is None:
+            duration = self.durations.get(name, 0.0)
+        if self.simulate and layer != "sleep" and duration:
+            self._real_sleep(duration)
+        with self._lock:
+            self.operations.append(Operation(layer, name, detail, duration))
+
+    def _sleep(self, seconds: float):
+        start = time.perf_counter()
+        self._real_sleep(seconds)
+        self.record("sleep", "sleep", f"{seconds:.3f}", time.perf_counter() - start)
+
+    def _run(self, args, *popenargs, **kwargs):
+        command = args if isinstance(args, str) else " ".join(str(arg) for arg in args)
+        self.record("subprocess", "subprocess", command)
+        return subprocess.CompletedProcess(args, 0, stdout="" if kwargs.get("text") else b"", stderr=b"")
+
+    def install(self):
+        """开始记录 time.sleep，并拦截 subprocess.run（gsettings、xclip、xdotool 等外部命令）。"""
+        time.sleep = self._sleep
+        subprocess.run = self._run
+        return self
+
+    def uninstall(self):
+        time.sleep = self._real_sleep
+        subprocess.run = self._real_run
+
+    def mark(self) -> int:
+        """返回当前的记录位置，配合 summary() 统计一段时间内的操作。"""
+        return len(self.operations)
+
+    def summary(self, start: int = 0) -> dict:
+        """统计 start 之后的操作：GUI 操作的模拟耗时、真实的 sleep 时间和各层的操作次数。"""
+        with self._lock:
+            operations = self.operations[start:]
+        gui = sum(op.duration for op in operations if op.layer != "sleep")
+        sleep = sum(op.duration for op in operations if op.layer == "sleep")
+        counts = {}
+        for op in operations:
+            counts[op.layer] = counts.get(op.layer, 0) + 1
+        return {"gui": gui, "sleep": sleep, "counts": counts, "operations": operations}
+
+
+class RecordingBackend(InputBackend):
+    """只记录不执行的输入后端，步骤中的 sleep 仍然真实执行。"""
+
+    name = "recording"
+
+    def __init__(self, recorder: Recorder):
+        self.recorder = recorder
+
+    def size(self) -> Size:
+        return self.recorder.screen_size
+
+    def run(self, steps: List[Step]):
+        for op, *args in steps:
+            if op == "sleep":
+                time.sleep(args[0])
+            elif op == "type":
+                self.recorder.record("input", "type", args[0], self.recorder.durations["type"] * len(args[0]))
+            else:
+                self.recorder.record("input", op, " ".join(str(arg) for arg in args))
+
+
+class RecordingClipboard(Clipboard):
+    """只记录不执行的剪贴板。"""
+
+    name = "recording"
+
+    def __init__(self, recorder: Recorder):
+        self.recorder = recorder
+
+    def copy_text(self, text: str):
+        self.recorder.record("clipboard", "copy_text", text[:32])
+
+    def copy_uri_list(self, uris: List[str]):
+        self.recorder.record("clipboard", "copy_uri_list", " ".join(uris))
+
+
+# 全局记录器，INPUT_BACKEND / CLIPBOARD_BACKEND 设为 recording 时使用
+recorder = Recorder()
@@ -0,0 +1,91 @@
+# Description: Microbenchmark of OneBot event building, compares the precompiled templates + JSON codec
+# with the old per-event default dict + recursive_update + json.dumps.
+# Usage: python3 scripts/bench_event_codec.py [count]
+import os
+import sys
+import json
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tui import recursive_update
+from autobot_rws import ReverseWebSocketProtocol, JSON_CODEC, json_loads
+
+BOT_QID = "123456789"
+
+EVENT = {
+    "time": int(time.time()),
+    "post_type": "message",
+    "message_type": "group",
+    "sub_type": "normal",
+    "message_id": 100000001,
+    "group_id": "987654321",
+    "user_id": 0,
+    "message": [{"type": "at", "data": {"qq": 123456789}}, {"type": "text", "data": {"text": "今天天气怎么样？"}}],
+    "raw_message": "今天天气怎么样？",
+    "sender": {"user_id": 0, "nickname": "群友", "role": "member"},
+}
+
+REQUEST = json.dumps(
+    {
+        "action": "send_group_msg",
+        "params": {"group_id": 987654321, "message": [{"type": "text", "data": {"text": "晴，25 度。" * 20}}]},
+        "echo": "1234",
+    }
+)
+
+
+def legacy_build_event_group_message(event: dict):
+    base_event = {
+        "time": int(time.time()),
+        "self_id": int(BOT_QID),
+        "post_type": "message",
+        "message_type": "group",
+        "sub_type": "normal",
+        "message_id": 0,
+        "group_id": 0,
+        "user_id": 0,
+        "anonymous": None,
+        "message": [],
+        "raw_message": "",
+        "font": 26,
+        "sender": {
+            "user_id": 0,
+            "nickname": "",
+            "card": "",
+            "sex": "unknown",
+            "age": 0,
+            "area": "unknown",
+            "level": "",
+            "role": "",
+            "title": "",
+        },
+    }
+    recursive_update(base_event, event)
+    return json.dumps(base_event)
+
+
+def bench(name, func, count):
+    seconds = min(timeit.repeat(func, number=count, repeat=5))
+    per_event = seconds / count * 1e6
+    print(f"{name:<32} {per_event:8.2f} us/op")
+    return per_event
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    adapter = ReverseWebSocketProtocol("ws://127.0.0.1:6199/ws", BOT_QID)
+    assert json.loads(adapter.build_event_group_message(EVENT)) == json.loads(legacy_build_event_group_message(EVENT))
+
+    print(f"JSON codec: {JSON_CODEC}, {count} ops")
+    old = bench("legacy group event", lambda: legacy_build_event_group_message(EVENT), count)
+    new = bench("template group event", lambda: adapter.build_event_group_message(EVENT), count)
+    print(f"{'':<32} {old / new:8.2f} x")
+    old = bench("legacy request decode", lambda: json.loads(REQUEST), count)
+    new = bench("codec request decode", lambda: json_loads(REQUEST), count)
+    print(f"{'':<32} {old / new:8.2f} x")
+
+
+if __name__ == "__main__":
+    main()
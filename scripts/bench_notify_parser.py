@@ -0,0 +1,119 @@
+# Description: Corpus-driven benchmark of the notification parser (notify_parser.py) against the old
+# split/startswith/replace parsing in message_monitor. The old parser's output is checked against the new
+# one on every notification it can handle, and the notifications that made it raise are counted.
+# Notifications without a sender (the new parser's "system" kind) are expected to differ.
+# The new parser is slower per notification than the old split (it checks every format instead of raising);
+# the timings show what that costs, the per-format behaviour is covered by tests/test_notify_parser.py.
+# The corpus is generated, or read from a file with one "chat_type<TAB>chat_name<TAB>content" per line
+# (a literal \n in content stands for a newline).
+# Usage: python3 scripts/bench_notify_parser.py [count] [corpus.tsv]
+import os
+import sys
+import random
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notify_parser import parse_notification
+
+SELF_NAME = "Vanilla"
+
+GROUP_NOTIFICATIONS = [
+    "张三：今天天气怎么样？",
+    "李四：[图片]",
+    "王五：[文件] 报告.pdf",
+    "赵六：时间是 12：30，别迟到",
+    "[有人@我] 张三：@Vanilla 帮我查一下",
+    "[有人@我] 李四：@全体成员 开会了",
+    "张三：第一行\n第二行：还有冒号",
+    "张三撤回了一条消息",
+    "李四加入了群聊",
+    "你有 3 条新通知",
+    "群友：" + "很长的一段话。" * 100,
+    "：没有发送者",
+    "",
+]
+PRIVATE_NOTIFICATIONS = ["你好", "[图片]", "在吗：有事", "你有 2 条新通知", "[语音]"]
+
+
+def legacy_parse(chat_type: str, chat_name: str, content: str):
+    """message_monitor 原来的解析方式。"""
+    if content.startswith("你有") and content.endswith("条新通知"):
+        return None
+    if chat_type == "group":
+        at_flag = False
+        if content.startswith("[有人@我] "):
+            content = content.replace("[有人@我] ", "")
+            content = content.replace(f"@{SELF_NAME} ", "")
+            at_flag = True
+        raw_message = content.split("：", 1)[1]
+        sender_nickname = content.split("：")[0]
+        return sender_nickname, raw_message, at_flag
+    return chat_name, content, False
+
+
+def load_corpus(path: str):
+    corpus = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            chat_type, chat_name, content = line.split("\t", 2)
+            corpus.append((chat_type, chat_name, content.replace("\\n", "\n")))
+    return corpus
+
+
+def generate_corpus(size: int = 1000):
+    rng = random.Random(0)
+    corpus = []
+    for _ in range(size):
+        if rng.random() < 0.7:
+            corpus.append(("group", "QQ群", rng.choice(GROUP_NOTIFICATIONS)))
+        else:
+            corpus.append(("private", "张三", rng.choice(PRIVATE_NOTIFICATIONS)))
+    return corpus
+
+
+def main():
+    args = sys.argv[1:]
+    count = int(args[0]) if args else 200
+    corpus = load_corpus(args[1]) if len(args) > 1 else generate_corpus()
+
+    legacy_errors = 0
+    mismatches = set()
+    for chat_type, chat_name, content in corpus:
+        parsed = parse_notification(chat_type, chat_name, content, SELF_NAME)
+        try:
+            old = legacy_parse(chat_type, chat_name, content)
+        except IndexError:
+            legacy_errors += 1
+            continue
+        if parsed.kind == "system":
+            continue
+        new = None if parsed.kind == "summary" else (parsed.sender, parsed.text, parsed.at_me)
+        if old != new and content not in mismatches:
+            mismatches.add(content)
+            print(f"mismatch: {content!r}: {old} != {new}")
+
+    def run_legacy():
+        for chat_type, chat_name, content in corpus:
+            try:
+                legacy_parse(chat_type, chat_name, content)
+            except IndexError:
+                pass
+
+    def run_parser():
+        for chat_type, chat_name, content in corpus:
+            parse_notification(chat_type, chat_name, content, SELF_NAME)
+
+    print(f"{len(corpus)} notifications, {count} rounds")
+    print(f"legacy parser raised on {legacy_errors}, mismatches with the new parser: {len(mismatches)}")
+    for name, func in (("legacy split parser", run_legacy), ("notify_parser", run_parser)):
+        seconds = min(timeit.repeat(func, number=count, repeat=5))
+        print(f"{name:<32} {seconds / count / len(corpus) * 1e6:8.3f} us/notification")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# Description: Headless benchmark of the whole send pipeline, from ReverseWebSocketProtocol.parse_request
+# through the send queue and the GUI executor to notify_auto.qq_send_messages. Input, clipboard and
+# subprocess calls are only recorded with simulated durations (see recording.py), time.sleep is real.
+# Every message is reported as GUI time (simulated), sleep time (real) and overhead (everything else).
+# Runs without an X session, QQ or xclip, and exits with 1 if any message fails, so it can run in CI.
+# Usage: python3 scripts/bench_send_pipeline.py [count] [--simulate] [--trace]
+import os
+import sys
+import time
+import atexit
+import asyncio
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml
+import notify_auto
+from recording import recorder
+from send_queue import send_queue
+from autobot_rws import ReverseWebSocketProtocol
+
+BOT_QID = "123456789"
+GROUP_ID = 987654321
+USER_ID = 233333333
+# 1x1 PNG
+IMAGE = "base64://iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+
+MESSAGES = {
+    "group text": ("send_group_msg", {"group_id": GROUP_ID, "message": [{"type": "text", "data": {"text": "晴，25 度。"}}]}),
+    "group at + text": (
+        "send_group_msg",
+        {
+            "group_id": GROUP_ID,
+            "message": [{"type": "at", "data": {"qq": USER_ID}}, {"type": "text", "data": {"text": "收到"}}],
+        },
+    ),
+    "private text": ("send_private_msg", {"user_id": USER_ID, "message": [{"type": "text", "data": {"text": "你好"}}]}),
+    "group image": ("send_group_msg", {"group_id": GROUP_ID, "message": [{"type": "image", "data": {"file": IMAGE}}]}),
+    "group 3 images": (
+        "send_group_msg",
+        {"group_id": GROUP_ID, "message": [{"type": "image", "data": {"file": IMAGE}}] * 3},
+    ),
+    "group text + image": (
+        "send_group_msg",
+        {
+            "group_id": GROUP_ID,
+            "message": [
+                {"type": "text", "data": {"text": "图片如下"}},
+                {"type": "image", "data": {"file": IMAGE}},
+                {"type": "text", "data": {"text": "以上"}},
+            ],
+        },
+    ),
+    "group long text": (
+        "send_group_msg",
+        {"group_id": GROUP_ID, "message": [{"type": "text", "data": {"text": "这是一段很长的回答。" * 800}}]},
+    ),
+}
+
+
+def load_config(temp_dir: str) -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(root, "config.default.yaml"), "r") as f:
+        config = yaml.load(f, Loader=yaml.FullLoader)
+    config.update(
+        {
+            "INPUT_BACKEND": "recording",
+            "CLIPBOARD_BACKEND": "recording",
+            "ADAPTIVE_WAIT": False,
+            "WINDOW_TARGETING": False,
+            "SIDEBAR_INDEX": False,
+            "SEND_COALESCE_WINDOW": 0,
+            "TEMP_DIR": temp_dir,
+            "chat_info": {
+                str(GROUP_ID): {"chat_name": "QQ群群名", "chat_type": "group"},
+                str(USER_ID): {"chat_name": "QQ用户名", "chat_type": "private"},
+            },
+        }
+    )
+    return config
+
+
+def ms(values) -> str:
+    return f"{statistics.mean(values) * 1000:8.1f}"
+
+
+async def run(count: int, trace: bool) -> bool:
+    adapter = ReverseWebSocketProtocol("", BOT_QID)
+    results = {name: [] for name in MESSAGES}
+    ok = True
+    for i in range(count):
+        for name, (action, params) in MESSAGES.items():
+            mark = recorder.mark()
+            start = time.perf_counter()
+            response = await adapter.parse_request({"action": action, "params": params, "echo": str(i)})
+            wall = time.perf_counter() - start
+            summary = recorder.summary(mark)
+            if '"retcode":0' not in response.replace(" ", ""):
+                print(f"{name}: failed, {response}")
+                ok = False
+            gui = summary["gui"] if recorder.simulate else 0.0
+            results[name].append((wall, summary["gui"], summary["sleep"], wall - summary["sleep"] - gui, summary))
+            if trace and i == 0:
+                print(f"--- {name}")
+                for op in summary["operations"]:
+                    print(f"    {op.layer:<10} {op.name:<12} {op.duration * 1000:7.1f} ms  {op.detail}")
+
+    print(f"{'message':<20} {'wall ms':>8} {'gui ms':>8} {'sleep ms':>8} {'over ms':>8} {'est ms':>8}  ops")
+    for name, rows in results.items():
+        walls, guis, sleeps, overheads, summaries = zip(*rows)
+        estimated = [g + s + o for g, s, o in zip(guis, sleeps, overheads)]
+        counts = summaries[-1]["counts"]
+        print(
+            f"{name:<20} {ms(walls)} {ms(guis)} {ms(sleeps)} {ms(overheads)} {ms(estimated)}  "
+            + ", ".join(f"{layer}={n}" for layer, n in sorted(counts.items()))
+        )
+    print("gui: simulated input/clipboard/subprocess time, sleep: real time.sleep, over: wall - sleep (- gui with --simulate)")
+    print("est: gui + sleep + overhead, the expected time per message on a real desktop")
+    return ok
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    count = int(args[0]) if args else 5
+    recorder.simulate = "--simulate" in sys.argv
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = load_config(temp_dir)
+        recorder.install()
+        try:
+            notify_auto.set_config(config)
+            send_queue.set_config(config)
+            notify_auto.init_auto()
+            ok = asyncio.run(run(count, "--trace" in sys.argv))
+            notify_auto.close_auto()
+            atexit.unregister(notify_auto.close_auto)
+        finally:
+            recorder.uninstall()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# Description: Bulk import group member lists into the sender index (sender_index.py), so that group
+# senders in received messages get their real user_id instead of a synthetic one.
+# The file is a JSON member list as returned by OneBot get_group_member_list (the whole response or only
+# its "data"), or a {"name": user_id} object. Both the card and the nickname of each member are indexed.
+# Usage: python3 scripts/import_group_members.py <group_id> <members.json> [sender_index.db]
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sender_index import SenderIndex
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python3 scripts/import_group_members.py <group_id> <members.json> [sender_index.db]")
+        sys.exit(2)
+    group_id, path = sys.argv[1], sys.argv[2]
+    db_path = sys.argv[3] if len(sys.argv) > 3 else "data/sender_index.db"
+    with open(path, "r", encoding="utf-8") as f:
+        members = json.load(f)
+    if isinstance(members, dict) and isinstance(members.get("data"), list):
+        members = members["data"]
+    index = SenderIndex(db_path)
+    count = index.import_members(group_id, members)
+    print(f"imported {count} names into group {group_id}, {len(index.members(group_id))} names in total ({db_path})")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/bin/bash
+# 多 QQ 实例模式：为每个实例启动一个 Xvfb display 和一个 QQ，每个 QQ 使用独立的用户目录（可以登录不同的账号）
+# 用法: bash scripts/run_qq_pool.sh [实例数量] [起始 display 编号] [屏幕分辨率]
+# 例如: bash scripts/run_qq_pool.sh 2 11 1920x1080 会启动 :11 和 :12，对应 config.yaml 中 workers 的 display
+# 首次使用时需要在各个 display 上扫码登录一次（例如 x11vnc -display :11），之后回车即可快速登录
+COUNT=${1:-2}
+BASE_DISPLAY=${2:-11}
+RESOLUTION=${3:-1920x1080}
+SCREEN_WIDTH=${RESOLUTION%x*}
+SCREEN_HEIGHT=${RESOLUTION#*x}
+HALF_WIDTH=$((SCREEN_WIDTH / 2))
+
+# 各个 QQ 必须和 AutoBot 使用同一个会话总线，通知监听才能收到它们的消息（不能用 dbus-run-session 的私有总线）
+if [ -z "$DBUS_SESSION_BUS_ADDRESS" ]; then
+    echo "[AutoBot] DBUS_SESSION_BUS_ADDRESS is not set, please run this script in the same session as AutoBot."
+    exit 1
+fi
+
+for ((i = 0; i < COUNT; i++)); do
+    display=":$((BASE_DISPLAY + i))"
+    qq_home="$(pwd)/data/qq_pool/$((BASE_DISPLAY + i))"
+    mkdir -p "$qq_home"
+
+    if ! xdpyinfo -display "$display" >/dev/null 2>&1; then
+        echo "[AutoBot] Starting Xvfb on $display..."
+        nohup Xvfb "$display" -screen 0 "${RESOLUTION}x24" -nolisten tcp >/dev/null 2>&1 &
+        sleep 1
+    fi
+
+    if [ "$(DISPLAY=$display xdotool search --onlyvisible --name "QQ" 2>/dev/null)" != "" ]; then
+        echo "[AutoBot] QQ is already running on $display, please check."
+        continue
+    fi
+
+    echo "[AutoBot] Starting QQ on $display..."
+    DISPLAY=$display HOME=$qq_home nohup /opt/QQ/qq --no-sandbox >/dev/null 2>&1 &
+    sleep 3
+    qq_login_window_id=$(DISPLAY=$display xdotool search --onlyvisible --name "QQ")
+    echo "[AutoBot] QQ login window id on $display: $qq_login_window_id"
+    DISPLAY=$display xdotool key Return
+
+    timeout=0
+    while true; do
+        sleep 1
+        qq_window_id=$(DISPLAY=$display xdotool search --onlyvisible --name "QQ")
+        if [ "$qq_window_id" != "" ] && [ "$qq_window_id" != "$qq_login_window_id" ]; then
+            echo "[AutoBot] QQ main window started on $display: $qq_window_id"
+            sleep 2
+            break
+        fi
+        timeout=$((timeout + 1))
+        if [ $timeout -gt 10 ]; then
+            echo "[AutoBot] QQ main window not found on $display, maybe you have not logged in."
+            break
+        fi
+    done
+
+    # 与 run_qq.sh 相同，QQ 窗口放在左半屏，config.yaml 中的坐标可以通用
+    if [ "$qq_window_id" != "" ]; then
+        DISPLAY=$display xdotool windowmove "$qq_window_id" 0 0
+        DISPLAY=$display xdotool windowsize "$qq_window_id" $HALF_WIDTH $SCREEN_HEIGHT
+    fi
+done
+
+echo "[AutoBot] $COUNT QQ instances started."
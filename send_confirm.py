@@ -0,0 +1,86 @@
+import time
+import numpy as np
+from collections import deque
+from typing import Callable, Optional
+from log_config import logger
+from adaptive_wait import grab_region, frames_differ
+from window_manager import Region
+
+
+class SendConfirmer:
+    """
+    发送确认。
+
+    按下 ctrl+enter 只说明发送键被按下了，消息是否真的出现在聊天记录中、什么时候出现都不知道。
+    启用后在发送前截取聊天区域作为基准，发送后轮询截图，直到聊天区域出现新的消息气泡（画面变化），
+    记录从按下发送到消息可见的延迟；超过 timeout 仍未变化视为发送失败。
+    聊天区域在确认期间收到别人的新消息也会被当作已发送，这里只用来发现明显的静默失败。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        timeout: float = 3.0,
+        poll_interval: float = 0.03,
+        pixel_threshold: int = 16,
+        change_ratio: float = 0.005,
+        history_size: int = 200,
+        grab: Callable[[Region], np.ndarray] = grab_region,
+    ):
+        self.enabled = enabled
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.pixel_threshold = pixel_threshold  # 灰度差超过该值的像素视为变化
+        self.change_ratio = change_ratio  # 变化像素占比超过该值视为出现了新消息
+        self.grab = grab
+        self.latencies = deque(maxlen=history_size)
+        self.confirmed = 0
+        self.timeouts = 0
+
+    def capture(self, region: Optional[Region]) -> Optional[np.ndarray]:
+        """发送前截取聊天区域作为基准，未启用或截图失败时返回 None，表示不做确认。"""
+        if not self.enabled or not region:
+            return None
+        try:
+            return self.grab(region)
+        except Exception as e:
+            logger.warning(f"截图失败，关闭发送确认: {e}")
+            self.enabled = False
+            return None
+
+    def confirm(self, region: Optional[Region], baseline: Optional[np.ndarray], start: float) -> Optional[float]:
+        """
+        等待聊天区域相对 baseline（capture 的返回值，不能为 None）出现变化，返回从 start 起的延迟，超时返回 None。
+        """
+        deadline = start + self.timeout
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                self.timeouts += 1
+                logger.warning(f"发送确认超时，{self.timeout} 秒内聊天区域没有出现新消息")
+                return None
+            time.sleep(min(self.poll_interval, deadline - now))
+            try:
+                frame = self.grab(region)
+            except Exception as e:
+                logger.warning(f"截图失败，关闭发送确认: {e}")
+                self.enabled = False
+                return now - start
+            if frames_differ(frame, baseline, self.pixel_threshold, self.change_ratio):
+                break
+        latency = time.monotonic() - start
+        self.latencies.append(latency)
+        self.confirmed += 1
+        logger.debug("发送确认: %.3f 秒后消息可见", latency)
+        return latency
+
+    def stats(self) -> dict:
+        stats = {"enabled": self.enabled, "confirmed": self.confirmed, "timeouts": self.timeouts}
+        if self.latencies:
+            stats["p50"] = round(float(np.percentile(self.latencies, 50)), 3)
+            stats["p95"] = round(float(np.percentile(self.latencies, 95)), 3)
+        return stats
+
+
+# 全局发送确认
+send_confirmer = SendConfirmer()
@@ -0,0 +1,142 @@
+import time
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from log_config import logger
+from gui_executor import GuiExecutor, gui_executor
+from notify_auto import SendResult, qq_send_messages
+
+
+class SendQueue:
+    """
+    GUI 执行器前面的发送队列，负责合并发给同一个聊天的发送动作。
+
+    AstrBot 经常在一秒内对同一个群连发好几个动作（例如一段文字加几张图片），
+    如果每个动作都单独走一遍 打开→输入→发送→关闭，大部分时间都花在切换窗口上。
+    这里按 (message_type, chat_id) 收集待发送的动作，从该聊天第一个动作到达起等待
+    coalesce_window 秒（默认为 0，只合并发送前一批时已经在排队的动作），然后在一次 打开→关闭 流程中
+    依次发送，每个动作仍是 QQ 中单独的一条消息，拿到自己的发送结果（message_id 和切分后的消息数）。
+
+    多个聊天同时有待发送的动作时，按聊天亲和性调度：优先发送当前已打开的聊天，
+    省掉 qq_open 中最耗时的 ctrl+f 搜索切换。同一聊天内保持先进先出；为防止其他聊天饿死，
+    连续优先当前聊天超过 max_affinity_streak 次，或最早的聊天已等待超过 max_affinity_wait 秒时，
+    改为发送最早到达的聊天。
+    """
+
+    def __init__(
+        self,
+        executor: GuiExecutor,
+        coalesce_window: float = 0,
+        max_batch: int = 10,
+        max_affinity_streak: int = 5,
+        max_affinity_wait: float = 10.0,
+    ):
+        self.executor = executor
+        self.coalesce_window = coalesce_window  # 合并窗口，单位为秒，0 表示只合并已经在排队的动作
+        self.max_batch = max_batch  # 一次 GUI 流程最多合并的动作数
+        self.max_affinity_streak = max_affinity_streak  # 连续插队优先当前聊天的最大次数
+        self.max_affinity_wait = max_affinity_wait  # 最早的聊天最多等待多少秒后不再被插队
+        self.merged = 0  # 因合并而省下的 GUI 流程次数
+        self.switches = 0  # 实际切换聊天的次数
+        self.switches_saved = 0  # 因优先当前聊天而省下的切换次数
+        self.starvation_picks = 0  # 因触发饥饿上限而放弃优先当前聊天的次数
+        self.current_chat: Optional[str] = None  # 执行器对应的 QQ 窗口中当前打开的聊天
+        self.sending: Optional[str] = None  # 正在发送的聊天
+        self._affinity_streak = 0
+        self._pending: Dict[Tuple[str, str], List[Tuple[list, asyncio.Future, float]]] = {}
+        self._wakeup = asyncio.Event()
+        self._worker_task: Optional[asyncio.Task] = None
+
+    def set_config(self, config: dict):
+        self.coalesce_window = config.get("SEND_COALESCE_WINDOW", self.coalesce_window)
+        self.max_batch = config.get("SEND_COALESCE_MAX_BATCH", self.max_batch)
+        self.max_affinity_streak = config.get("SEND_AFFINITY_MAX_STREAK", self.max_affinity_streak)
+        self.max_affinity_wait = config.get("SEND_AFFINITY_MAX_WAIT", self.max_affinity_wait)
+
+    def stats(self) -> dict:
+        """发送队列的统计信息。"""
+        return {
+            "pending": sum(len(items) for items in self._pending.values()),
+            "pending_chats": len(self._pending),
+            "merged": self.merged,
+            "switches": self.switches,
+            "switches_saved": self.switches_saved,
+            "starvation_picks": self.starvation_picks,
+        }
+
+    def busy(self, chat_id) -> bool:
+        """chat_id 是否还有排队中或正在发送的动作。"""
+        chat_id = str(chat_id)
+        return self.sending == chat_id or any(key[1] == chat_id for key in self._pending)
+
+    async def submit(self, message_type: str, chat_id, message: list) -> Optional[SendResult]:
+        """提交一个发送动作，等待其被发送后返回发送结果，失败返回 None。"""
+        future = asyncio.get_running_loop().create_future()
+        key = (message_type, str(chat_id))
+        self._pending.setdefault(key, []).append((message, future, time.monotonic()))
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._worker())
+        self._wakeup.set()
+        return await future
+
+    def _select_key(self) -> Tuple[str, str]:
+        """选出下一个要发送的聊天：优先当前已打开的聊天，但不能让最早到达的聊天饿死。"""
+        oldest_key = min(self._pending, key=lambda key: self._pending[key][0][2])
+        affinity_key = next((key for key in self._pending if key[1] == self.current_chat), None)
+        if affinity_key is None or affinity_key == oldest_key:
+            self._affinity_streak = 0
+            return oldest_key
+        oldest_wait = time.monotonic() - self._pending[oldest_key][0][2]
+        if self._affinity_streak >= self.max_affinity_streak or oldest_wait >= self.max_affinity_wait:
+            self._affinity_streak = 0
+            self.starvation_picks += 1
+            return oldest_key
+        self._affinity_streak += 1
+        self.switches_saved += 1
+        return affinity_key
+
+    def _take_batch(self, key: Tuple[str, str]) -> List[Tuple[list, asyncio.Future, float]]:
+        """取出一个聊天的一批动作，超过 max_batch 的部分继续排队。"""
+        items = self._pending.pop(key)
+        batch, rest = items[: self.max_batch], items[self.max_batch :]
+        if rest:
+            self._pending[key] = rest
+        return batch
+
+    async def _worker(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            key = self._select_key()
+            # 等待合并窗口：从该聊天第一个动作到达开始计时
+            delay = self._pending[key][0][2] + self.coalesce_window - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            message_type, chat_id = key
+            batch = [item for item in self._take_batch(key) if not item[1].done()]  # 跳过已被取消的动作
+            if not batch:
+                continue
+            if chat_id != self.current_chat:
+                self.switches += 1
+            if len(batch) > 1:
+                self.merged += len(batch) - 1
+                logger.debug("合并 %s 个发送动作: %s，累计省下 %s 次 GUI 流程", len(batch), chat_id, self.merged)
+            self.sending = chat_id
+            try:
+                results = await self.executor.submit(
+                    qq_send_messages, message_type, chat_id, [message for message, _, _ in batch]
+                )
+            except Exception as e:
+                logger.error(f"发送消息时发生异常: {e}")
+                results = [None] * len(batch)
+            finally:
+                self.sending = None
+            self.current_chat = chat_id
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+# 全局发送队列，所有发送动作都经过它进入 GUI 执行器
+send_queue = SendQueue(gui_executor)
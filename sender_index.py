@@ -0,0 +1,189 @@
+import os
+import zlib
+import sqlite3
+import asyncio
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from log_config import logger
+
+
+class SenderIndex:
+    """
+    按群保存的 名称 -> user_id 索引，保存在 SQLite 中：依次查找导入的群成员、chat_info，
+    都查不到时分配由 (群号, 名称) 决定的合成 id（>= SYNTHETIC_BASE），新条目每 flush_interval 秒批量写盘。
+    """
+
+    SYNTHETIC_BASE = 900_000_000_000
+
+    def __init__(self, path: str = ":memory:", flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval  # 新分配的合成 id 最多延迟多少秒写盘
+        self.groups: Dict[str, Dict[str, int]] = {}  # group_id -> {名称: user_id}
+        self.fallback: Dict[str, int] = {}  # 配置中的 名称 -> id，所有群共用
+        self.seeds: Dict[str, object] = {}  # 配置中的群成员列表，打开数据库时导入
+        self.hits = 0
+        self.fallback_hits = 0
+        self.synthetic = 0  # 分配的合成 id 数
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[str, str, int]] = []  # 尚未写盘的 (group_id, 名称, user_id)
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._lock = threading.RLock()  # 数据库连接会在事件循环和 GUI 线程中使用
+
+    def _open(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._conn is None:
+                if self.path != ":memory:":
+                    os.makedirs(os.path.dirname(self.path) or "./", exist_ok=True)
+                self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS senders ("
+                    "group_id TEXT NOT NULL, name TEXT NOT NULL, user_id INTEGER NOT NULL, "
+                    "PRIMARY KEY (group_id, name))"
+                )
+                for group_id, name, user_id in self._conn.execute("SELECT group_id, name, user_id FROM senders"):
+                    self.groups.setdefault(group_id, {})[name] = user_id
+                logger.debug("群成员索引: %s 个群，%s 个名称", len(self.groups), sum(map(len, self.groups.values())))
+                for group_id, members in self.seeds.items():
+                    self.import_members(group_id, members)
+        return self._conn
+
+    def set_path(self, path: str):
+        if path != self.path:
+            self.close()
+            self.groups = {}
+            self.path = path
+
+    def _save(self, rows: List[Tuple[str, str, int]]):
+        with self._lock:
+            conn = self._open()
+            try:
+                conn.execute("BEGIN")
+                conn.executemany("INSERT OR REPLACE INTO senders (group_id, name, user_id) VALUES (?, ?, ?)", rows)
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    def _save_later(self, group_id: str, name: str, user_id: int):
+        """在事件循环中攒批写盘，没有运行中的事件循环时（例如脚本中）立即写盘。"""
+        self._pending.append((group_id, name, user_id))
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        self._flush_handle = loop.call_later(self.flush_interval, self.flush)
+
+    def flush(self):
+        """把尚未写盘的合成 id 一次写入数据库。"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        rows, self._pending = self._pending, []
+        if not rows:
+            return
+        try:
+            self._save(rows)
+        except Exception as e:
+            logger.error(f"群成员索引写入失败: {e}")
+
+    def synthetic_id(self, group_id: str, name: str) -> int:
+        """(群号, 名称) 对应的稳定的合成 id，与群内已有的 id 冲突时顺延。"""
+        members = self.groups.get(group_id, {})
+        used = set(members.values())
+        user_id = self.SYNTHETIC_BASE + zlib.crc32(f"{group_id}\0{name}".encode("utf-8"))
+        while user_id in used:
+            user_id += 1
+        return user_id
+
+    def resolve(self, group_id, name: str) -> int:
+        """查找群 group_id 中名为 name 的发送者的 user_id，没有记录时分配并保存一个合成 id。"""
+        group_id = str(group_id)
+        self._open()
+        members = self.groups.get(group_id)
+        if members is not None:
+            user_id = members.get(name)
+            if user_id is not None:
+                self.hits += 1
+                return user_id
+        user_id = self.fallback.get(name)
+        if user_id is not None:
+            self.fallback_hits += 1
+            return user_id
+        user_id = self.synthetic_id(group_id, name)
+        self.groups.setdefault(group_id, {})[name] = user_id
+        self._save_later(group_id, name, user_id)
+        self.synthetic += 1
+        logger.debug("群 %s 的新发送者 %s 分配合成 id %s", group_id, name, user_id)
+        return user_id
+
+    def import_members(self, group_id, members: Iterable) -> int:
+        """
+        批量导入群成员，members 为 get_group_member_list 返回的成员列表（含 user_id、nickname、card），
+        或者 {名称: user_id} 字典。群名片和昵称都登记到该成员的 QQ 号，返回登记的名称数。
+        """
+        group_id = str(group_id)
+        self._open()
+        if isinstance(members, dict):
+            entries = {str(name): int(user_id) for name, user_id in members.items()}
+        else:
+            entries = {}
+            for member in members:
+                for key in ("nickname", "card"):
+                    if member.get(key):
+                        entries[member[key]] = int(member["user_id"])
+        changed = {name: user_id for name, user_id in entries.items() if self.groups.get(group_id, {}).get(name) != user_id}
+        if changed:
+            self.groups.setdefault(group_id, {}).update(changed)
+            self._save([(group_id, name, user_id) for name, user_id in changed.items()])
+        logger.info(f"群 {group_id} 导入 {len(entries)} 个成员名称，其中 {len(changed)} 个为新增或变化")
+        return len(entries)
+
+    def name_of(self, group_id, user_id: int) -> Optional[str]:
+        """
+        反查群 group_id 中 user_id 的名称（导入的成员同时登记了昵称和群名片时取后登记的群名片），
+        用于 @ 群成员：AstrBot 回复时给出的是 user_id，QQ 中要输入的是名称。
+        内存中没有时从数据库重新读取该群，另一个进程（例如主进程）新写入的条目也能查到。
+        """
+        group_id = str(group_id)
+
+        def find() -> Optional[str]:
+            names = [name for name, member_id in list(self.groups.get(group_id, {}).items()) if member_id == user_id]
+            return names[-1] if names else None
+
+        with self._lock:
+            conn = self._open()
+            name = find()
+            if name is None:
+                rows = conn.execute("SELECT name, user_id FROM senders WHERE group_id = ?", (group_id,)).fetchall()
+                self.groups.setdefault(group_id, {}).update(rows)
+                name = find()
+        return name
+
+    def members(self, group_id) -> Dict[str, int]:
+        self._open()
+        return dict(self.groups.get(str(group_id), {}))
+
+    def stats(self) -> dict:
+        return {
+            "groups": len(self.groups),
+            "names": sum(map(len, self.groups.values())),
+            "hits": self.hits,
+            "fallback_hits": self.fallback_hits,
+            "synthetic": self.synthetic,
+        }
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# 全局群成员索引
+sender_index = SenderIndex()
@@ -0,0 +1,163 @@
+import threading
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+from log_config import logger
+from adaptive_wait import grab_region
+from window_manager import Region
+
+
+class SidebarIndex:
+    """
+    QQ 左侧最近聊天列表的位置索引：按截取的行模板在列表中找到聊天并直接点击，点击后用标题模板确认。
+    没有唯一的最佳匹配（差距小于 ambiguity_margin）或标题不一致时返回 None，由调用方退回到搜索。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        region: Optional[Region] = None,
+        title_region: Optional[Region] = None,
+        row_height: int = 72,
+        pinned_rows: int = 0,
+        pixel_threshold: int = 40,
+        max_mismatch: float = 0.1,
+        ambiguity_margin: float = 0.05,
+        grab: Callable[[Region], np.ndarray] = grab_region,
+    ):
+        self.enabled = enabled
+        self.region = region  # 最近聊天列表所在的屏幕区域
+        self.title_region = title_region  # 聊天窗口顶部标题所在的屏幕区域
+        self.row_height = row_height  # 每一行的高度（像素）
+        self.pinned_rows = pinned_rows  # 列表顶部置顶聊天的行数，不参与排序
+        self.pixel_threshold = pixel_threshold  # 与背景灰度差超过该值的像素视为文字/图像
+        self.max_mismatch = max_mismatch  # 模板与截图不一致的比例超过该值视为不匹配
+        self.ambiguity_margin = ambiguity_margin  # 最佳匹配与次佳匹配的差距小于该值时视为有歧义
+        self.grab = grab
+        self.order: List[str] = []  # 最近聊天的顺序，越靠前越新
+        self.templates: Dict[str, np.ndarray] = {}  # 列表中每一行的模板
+        self.titles: Dict[str, np.ndarray] = {}  # 聊天标题的模板
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rows(self) -> int:
+        """可见的行数。"""
+        return self.region[3] // self.row_height if self.region else 0
+
+    def stats(self) -> dict:
+        return {"indexed": len(self.templates), "hits": self.hits, "misses": self.misses}
+
+    def touch(self, chat_id: str):
+        """聊天有新消息（发送或收到），移到最近聊天的最前面。"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if chat_id in self.order:
+                self.order.remove(chat_id)
+            self.order.insert(0, chat_id)
+            del self.order[max(self.rows, 1) * 2 :]
+
+    def _mask(self, image: np.ndarray) -> np.ndarray:
+        # 减去背景（中位数），选中行的高亮背景不影响比较
+        return np.abs(image - np.median(image)) > self.pixel_threshold
+
+    def _row_images(self, image: np.ndarray) -> List[np.ndarray]:
+        """把列表截图切成每一行的头像和名称部分（每行左侧 70%、上方 60%），转为前景掩码。"""
+        step_h = image.shape[0] * self.row_height / self.region[3]  # 截图是缩小取样的
+        masks = []
+        for row in range(self.rows):
+            top = int(row * step_h)
+            masks.append(self._mask(image[top : top + int(step_h * 0.6), : int(image.shape[1] * 0.7)]))
+        return masks
+
+    def _mismatch(self, a: np.ndarray, b: np.ndarray) -> float:
+        if a.shape != b.shape:
+            return 1.0
+        union = np.count_nonzero(a | b)
+        return np.count_nonzero(a ^ b) / union if union else 1.0
+
+    def _unique_best(self, scores: List[float]) -> Optional[int]:
+        """返回不一致比例最小且没有歧义的候选的下标：不超过 max_mismatch，并且比其他候选都小 ambiguity_margin 以上。"""
+        if not scores:
+            return None
+        best = int(np.argmin(scores))
+        if scores[best] > self.max_mismatch:
+            return None
+        if any(i != best and score - scores[best] < self.ambiguity_margin for i, score in enumerate(scores)):
+            return None
+        return best
+
+    def capture(self, chat_id: str):
+        """
+        刚向 chat_id 发送了消息：截取聊天标题作为标题模板，它位于置顶聊天之下的第一行，截取该行作为列表模板。
+        截到的行与其他聊天的模板相同时说明列表还没有更新，两者都不保存。
+        """
+        if not self.enabled or not self.title_region or self.pinned_rows >= self.rows:
+            return
+        try:
+            title = self._mask(self.grab(self.title_region))
+            row = self._row_images(self.grab(self.region))[self.pinned_rows]
+        except Exception as e:
+            logger.warning(f"截取最近聊天列表失败: {e}")
+            return
+        with self._lock:
+            self.titles[chat_id] = title
+            for other, template in list(self.templates.items()):
+                if other != chat_id and self._mismatch(row, template) <= self.max_mismatch:
+                    del self.templates[other]
+                    self.templates.pop(chat_id, None)
+                    return
+            self.templates[chat_id] = row
+
+    def locate(self, chat_id: str) -> Optional[Tuple[int, int]]:
+        """返回 chat_id 在最近聊天列表中可以点击的坐标，不在列表中或校验失败时返回 None。"""
+        if not self.enabled or chat_id not in self.templates or chat_id not in self.titles or self.rows == 0:
+            return None
+        with self._lock:
+            template = self.templates[chat_id]
+            predicted = self.pinned_rows + self.order.index(chat_id) if chat_id in self.order else -1
+        try:
+            masks = self._row_images(self.grab(self.region))
+        except Exception as e:
+            logger.warning(f"截取最近聊天列表失败: {e}")
+            return None
+        # 在所有可见行中找唯一匹配的一行；预测的位置可能不对（例如有未收到通知的消息），只用于日志
+        row = self._unique_best([self._mismatch(template, mask) for mask in masks])
+        if row is None:
+            self.misses += 1
+            logger.debug("最近聊天列表中未找到或有多个相似的行: %s", chat_id)
+            return None
+        if row != predicted:
+            logger.debug("%s 在最近聊天列表的第 %s 行，预测为第 %s 行", chat_id, row, predicted)
+        left, top, width, height = self.region
+        return left + width // 2, top + row * self.row_height + self.row_height // 2
+
+    def verify(self, chat_id: str) -> bool:
+        """
+        点击列表之后确认打开的是 chat_id：比较聊天标题，标题与 chat_id 的模板不一致，
+        或者与其他聊天的标题模板同样相似（有歧义）时，丢弃该聊天的列表模板。
+        """
+        try:
+            title = self._mask(self.grab(self.title_region))
+        except Exception as e:
+            logger.warning(f"截取聊天标题失败: {e}")
+            title = None
+        matched = False
+        if title is not None:
+            with self._lock:
+                candidates = [chat_id] + [other for other in self.titles if other != chat_id]
+                scores = [self._mismatch(self.titles[other], title) for other in candidates]
+            matched = self._unique_best(scores) == 0
+        if matched:
+            self.hits += 1
+        else:
+            self.misses += 1
+            logger.debug("打开的聊天与预期不一致: %s", chat_id)
+            with self._lock:
+                self.templates.pop(chat_id, None)
+        return matched
+
+
+# 全局最近聊天位置索引
+sidebar_index = SidebarIndex()
@@ -0,0 +1,61 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup_cache import DedupCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_repeats_within_window_are_dropped():
+    cache = DedupCache(repeat_count=3, window=2.0, clock=FakeClock())
+    assert [cache.is_duplicate("a") for _ in range(3)] == [False, True, True]
+    assert cache.stats() == {"size": 0, "hits": 2, "misses": 1, "evictions": 0}
+
+
+def test_same_content_after_all_repeats_passes_again():
+    cache = DedupCache(repeat_count=2, clock=FakeClock())
+    assert [cache.is_duplicate("1") for _ in range(4)] == [False, True, False, True]
+
+
+def test_ttl_expires_entries():
+    clock = FakeClock()
+    cache = DedupCache(repeat_count=2, window=2.0, clock=clock)
+    assert not cache.is_duplicate("a")
+    clock.now = 1.9
+    assert not cache.is_duplicate("b")
+    clock.now = 2.0
+    # a 已过期，作为新消息放行；b 仍在窗口内
+    assert not cache.is_duplicate("a")
+    assert cache.is_duplicate("b")
+    assert cache.evictions == 1
+
+
+def test_max_size_evicts_oldest_entries():
+    cache = DedupCache(repeat_count=2, window=100.0, max_size=2, clock=FakeClock())
+    for key in "abc":
+        assert not cache.is_duplicate(key)
+    assert len(cache) == 2
+    assert cache.evictions == 1
+    assert not cache.is_duplicate("a")
+    assert cache.is_duplicate("c")
+
+
+def test_repeat_count_one_disables_dedup():
+    cache = DedupCache(repeat_count=1, clock=FakeClock())
+    assert [cache.is_duplicate("a") for _ in range(3)] == [False, False, False]
+    assert len(cache) == 0
+
+
+def test_tuple_keys():
+    cache = DedupCache(repeat_count=2, clock=FakeClock())
+    assert not cache.is_duplicate(("群", "张三：hi"))
+    assert not cache.is_duplicate(("群2", "张三：hi"))
+    assert cache.is_duplicate(("群", "张三：hi"))
@@ -0,0 +1,121 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_journal import EventJournal
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "journal.db")
+
+
+def payloads(journal, name="a"):
+    return [payload for _, payload in journal.read(name)]
+
+
+def test_append_and_read_in_order(path):
+    journal = EventJournal(path, cursor_names=["a"])
+    assert journal.append(["e1", "e2"]) == 2
+    assert journal.append(["e3"]) == 3
+    assert journal.read("a") == [(1, "e1"), (2, "e2"), (3, "e3")]
+    assert journal.read("a", limit=2) == [(1, "e1"), (2, "e2")]
+    journal.close()
+
+
+def test_ack_moves_only_its_own_cursor(path):
+    journal = EventJournal(path, cursor_names=["a", "b"])
+    journal.append(["e1", "e2", "e3"])
+    journal.ack("a", 2)
+    assert payloads(journal, "a") == ["e3"]
+    assert payloads(journal, "b") == ["e1", "e2", "e3"]
+    # 确认更早的序号不会让游标后退
+    journal.ack("a", 1)
+    assert payloads(journal, "a") == ["e3"]
+    journal.close()
+
+
+def test_flush_deletes_events_acked_by_every_cursor(path):
+    journal = EventJournal(path, cursor_names=["a", "b"])
+    journal.append(["e1", "e2", "e3"])
+    journal.ack("a", 3)
+    journal.ack("b", 1)
+    journal.flush()
+    rows = journal._conn.execute("SELECT seq FROM events ORDER BY seq").fetchall()
+    assert rows == [(2,), (3,)]
+    journal.close()
+
+
+def test_reopen_replays_unacked_events(path):
+    journal = EventJournal(path, cursor_names=["a"])
+    journal.append(["e1", "e2", "e3"])
+    journal.ack("a", 1)
+    journal.close()
+
+    journal = EventJournal(path, cursor_names=["a"])
+    assert journal.read("a") == [(2, "e2"), (3, "e3")]
+    assert journal.pending() == 2
+    assert journal.append(["e4"]) == 4
+    journal.close()
+
+
+def test_reopen_new_cursor_starts_from_oldest_saved_cursor(path):
+    journal = EventJournal(path, cursor_names=["a", "b"])
+    journal.append(["e1", "e2", "e3"])
+    journal.ack("a", 3)
+    journal.ack("b", 1)
+    journal.close()
+
+    journal = EventJournal(path, cursor_names=["a", "c"])
+    assert payloads(journal, "a") == []
+    assert payloads(journal, "c") == ["e2", "e3"]
+    journal.close()
+
+
+def test_trim_drops_oldest_unsent_events(path):
+    journal = EventJournal(path, max_events=3, cursor_names=["a"])
+    for i in range(5):
+        journal.append([f"e{i}"])
+    assert payloads(journal) == ["e2", "e3", "e4"]
+    stats = journal.stats()
+    assert stats["depth"] == 3
+    assert stats["high_watermark"] == 3
+    assert stats["dropped"] == 2
+    journal.close()
+
+
+def test_trim_survives_reopen(path):
+    journal = EventJournal(path, max_events=2, cursor_names=["a"])
+    journal.append(["e1", "e2", "e3", "e4"])
+    journal.close()
+
+    journal = EventJournal(path, max_events=2, cursor_names=["a"])
+    assert payloads(journal) == ["e3", "e4"]
+    journal.close()
+
+
+def test_failed_append_rolls_back_and_retries(path):
+    journal = EventJournal(path, cursor_names=["a"])
+    journal.append(["e1"])
+    journal._conn.execute("CREATE TRIGGER fail BEFORE INSERT ON events BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+    with pytest.raises(Exception):
+        journal.append(["e2", "e3"])
+    assert journal.last_seq == 1
+    assert journal.stats()["failed"] == 1
+    assert journal.pending() == 3
+
+    journal._conn.execute("DROP TRIGGER fail")
+    assert journal.append(["e4"]) == 4
+    assert payloads(journal) == ["e1", "e2", "e3", "e4"]
+    journal.close()
+
+
+def test_without_cursors_keeps_events_in_memory(path):
+    journal = EventJournal(path, cursor_names=[])
+    assert journal.append(["e1", "e2"]) == 2
+    assert journal.read_after(0) == [(1, "e1"), (2, "e2")]
+    assert journal._conn.execute("SELECT COUNT(*) FROM events").fetchone() == (0,)
+    journal.close()
@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inbound_queue import BoundedEventQueue, event_key
+from event_journal import EventJournal
+from autobot_rws import merge_event_frames
+
+
+def message(user_id: int, text: str, group_id: int = 1) -> dict:
+    return {
+        "post_type": "message",
+        "message_type": "group",
+        "group_id": group_id,
+        "user_id": user_id,
+        "message": [{"type": "text", "data": {"text": text}}],
+        "raw_message": text,
+    }
+
+
+def drain(queue: BoundedEventQueue):
+    events = []
+    while not queue.empty():
+        events.append(queue.get_nowait())
+    return events
+
+
+def test_fifo_below_maxsize():
+    queue = BoundedEventQueue(maxsize=3)
+    for i in range(3):
+        queue.put_nowait(message(i, f"m{i}"))
+    assert [event["raw_message"] for event in drain(queue)] == ["m0", "m1", "m2"]
+    assert queue.stats()["dropped"] == 0
+
+
+def test_drop_oldest():
+    queue = BoundedEventQueue(maxsize=2, policy="drop-oldest")
+    for i in range(4):
+        queue.put_nowait(message(i, f"m{i}"))
+    assert [event["raw_message"] for event in drain(queue)] == ["m2", "m3"]
+    stats = queue.stats()
+    assert stats["dropped"] == 2
+    assert stats["high_watermark"] == 2
+    assert stats["depth"] == 0
+
+
+def test_coalesce_merges_into_same_sender():
+    queue = BoundedEventQueue(maxsize=2, policy="coalesce")
+    queue.put_nowait(message(1, "a"))
+    queue.put_nowait(message(2, "b"))
+    queue.put_nowait(message(1, "c"))
+    events = drain(queue)
+    assert [event["raw_message"] for event in events] == ["a\nc", "b"]
+    assert [segment["data"]["text"] for segment in events[0]["message"]] == ["a", "\n", "c"]
+    assert queue.stats()["coalesced"] == 1
+
+
+def test_coalesce_without_target_drops_oldest():
+    queue = BoundedEventQueue(maxsize=2, policy="coalesce")
+    for i in range(3):
+        queue.put_nowait(message(i, f"m{i}"))
+    assert [event["raw_message"] for event in drain(queue)] == ["m1", "m2"]
+    assert queue.stats()["dropped"] == 1
+
+
+def test_coalesce_does_not_merge_into_removed_event():
+    queue = BoundedEventQueue(maxsize=1, policy="coalesce")
+    queue.put_nowait(message(1, "a"))
+    assert queue.get_nowait()["raw_message"] == "a"
+    queue.put_nowait(message(2, "b"))
+    queue.put_nowait(message(1, "c"))
+    assert [event["raw_message"] for event in drain(queue)] == ["c"]
+
+
+def test_unknown_policy_falls_back_to_drop_oldest():
+    queue = BoundedEventQueue()
+    queue.set_config({"EVENT_QUEUE_POLICY": "spill", "EVENT_QUEUE_MAX_SIZE": 5})
+    assert queue.policy == "drop-oldest"
+    assert queue.maxsize == 5
+
+
+def test_get_waits_for_put():
+    async def main():
+        queue = BoundedEventQueue()
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+        queue.put_nowait(message(1, "a"))
+        return await asyncio.wait_for(getter, 1)
+
+    assert asyncio.run(main())["raw_message"] == "a"
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = EventJournal(
+        str(tmp_path / "journal.db"), max_events=2, cursor_names=["a"], policy="coalesce", merge=merge_event_frames
+    )
+    yield journal
+    journal.close()
+
+
+def append(journal: EventJournal, *events: dict):
+    journal.append([json.dumps(event, ensure_ascii=False) for event in events], [event_key(event) for event in events])
+
+
+def raw_messages(journal: EventJournal):
+    return [json.loads(payload)["raw_message"] for _, payload in journal.read("a")]
+
+
+def test_journal_coalesces_backlog(journal):
+    append(journal, message(1, "a"), message(2, "b"))
+    append(journal, message(1, "c"), message(2, "d"))
+    assert raw_messages(journal) == ["a\nc", "b\nd"]
+    stats = journal.stats()
+    assert stats["coalesced"] == 2
+    assert stats["dropped"] == 0
+    assert stats["depth"] == 2
+
+
+def test_journal_coalesce_without_target_drops_oldest(journal):
+    append(journal, message(1, "a"), message(2, "b"))
+    append(journal, message(3, "c"))
+    assert raw_messages(journal) == ["b", "c"]
+    assert journal.stats()["dropped"] == 1
+
+
+def test_journal_does_not_coalesce_into_read_events(journal):
+    append(journal, message(1, "a"), message(2, "b"))
+    journal.read("a", limit=1)
+    append(journal, message(1, "c"))
+    assert raw_messages(journal) == ["b", "c"]
+    assert journal.stats()["coalesced"] == 0
+
+
+def test_journal_coalesce_below_capacity_appends(journal):
+    append(journal, message(1, "a"))
+    append(journal, message(1, "b"))
+    assert raw_messages(journal) == ["a", "b"]
@@ -0,0 +1,101 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notify_parser import ParsedNotification, parse_notification
+
+SELF_NAME = "Vanilla"
+
+
+@pytest.mark.parametrize(
+    "content, sender, text",
+    [
+        ("张三：今天天气怎么样？", "张三", "今天天气怎么样？"),
+        # 只在第一个全角冒号处分开，内容中的冒号保留
+        ("赵六：时间是 12：30，别迟到", "赵六", "时间是 12：30，别迟到"),
+        # 内容中的换行保留
+        ("张三：第一行\n第二行：还有冒号", "张三", "第一行\n第二行：还有冒号"),
+        ("张三：", "张三", ""),
+    ],
+)
+def test_group_sender_and_text(content, sender, text):
+    assert parse_notification("group", "QQ群", content, SELF_NAME) == ParsedNotification("group", sender, text)
+
+
+def test_at_me_strips_prefix_and_self_name():
+    parsed = parse_notification("group", "QQ群", "[有人@我] 张三：@Vanilla 帮我查一下", SELF_NAME)
+    assert parsed == ParsedNotification("group", "张三", "帮我查一下", at_me=True)
+
+
+def test_at_me_keeps_other_mentions():
+    parsed = parse_notification("group", "QQ群", "[有人@我] 李四：@全体成员 开会了", SELF_NAME)
+    assert parsed == ParsedNotification("group", "李四", "@全体成员 开会了", at_me=True)
+
+
+def test_at_me_without_self_name_keeps_mention():
+    parsed = parse_notification("group", "QQ群", "[有人@我] 张三：@Vanilla 帮我查一下")
+    assert parsed == ParsedNotification("group", "张三", "@Vanilla 帮我查一下", at_me=True)
+
+
+def test_at_in_text_is_not_at_me():
+    parsed = parse_notification("group", "QQ群", "张三：[有人@我] 不是开头", SELF_NAME)
+    assert parsed.kind == "group"
+    assert not parsed.at_me
+    assert parsed.text == "[有人@我] 不是开头"
+
+
+@pytest.mark.parametrize(
+    "chat_type, content, placeholders",
+    [
+        ("group", "李四：[图片]", ("图片",)),
+        ("group", "王五：[文件] 报告.pdf", ("文件",)),
+        ("group", "李四：[图片][图片]看这个[动画表情]", ("图片", "图片", "动画表情")),
+        ("group", "张三：[不是占位符]", ()),
+        ("private", "[语音]", ("语音",)),
+        ("private", "[视频]和[闪照]", ("视频", "闪照")),
+    ],
+)
+def test_placeholders(chat_type, content, placeholders):
+    assert parse_notification(chat_type, "张三", content, SELF_NAME).placeholders == placeholders
+
+
+@pytest.mark.parametrize("chat_type", ["group", "private"])
+@pytest.mark.parametrize("content", ["你有 3 条新通知", "你有2条新通知"])
+def test_summary(chat_type, content):
+    assert parse_notification(chat_type, "张三", content, SELF_NAME) == ParsedNotification("summary", "", content)
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "张三撤回了一条消息",
+        "李四加入了群聊",
+        "：没有发送者",
+        "",
+    ],
+)
+def test_group_without_sender_is_system(content):
+    assert parse_notification("group", "QQ群", content, SELF_NAME) == ParsedNotification("system", "", content)
+
+
+def test_newline_in_sender_is_system():
+    content = "第一行\n第二行：内容"
+    assert parse_notification("group", "QQ群", content, SELF_NAME) == ParsedNotification("system", "", content)
+
+
+def test_at_me_without_sender_is_system():
+    parsed = parse_notification("group", "QQ群", "[有人@我] 管理员设置了新的群公告", SELF_NAME)
+    assert parsed == ParsedNotification("system", "", "管理员设置了新的群公告", at_me=True)
+
+
+@pytest.mark.parametrize("content", ["你好", "在吗：有事", "[有人@我] 张三：不会拆分"])
+def test_private_uses_chat_name_and_keeps_content(content):
+    assert parse_notification("private", "张三", content, SELF_NAME) == ParsedNotification("private", "张三", content)
+
+
+@pytest.mark.parametrize("content", [None, 123, b"\xe5\xbc\xa0\xe4\xb8\x89", ["张三：你好"]])
+def test_non_str_content(content):
+    assert parse_notification("group", "QQ群", content, SELF_NAME) is None
@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from send_queue import SendQueue
+
+
+class FakeExecutor:
+    """记录每次 GUI 流程发送的聊天和消息，每条消息的发送结果为 "聊天:消息"。"""
+
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+        self.pending = 0
+
+    async def submit(self, func, message_type, chat_id, messages):
+        self.calls.append((chat_id, list(messages)))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("QQ 窗口不存在")
+        return [f"{chat_id}:{message}" for message in messages]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_queued_actions_to_one_chat_share_one_gui_cycle():
+    async def main():
+        executor = FakeExecutor()
+        queue = SendQueue(executor)
+        results = await asyncio.gather(*(queue.submit("group", "1", f"m{i}") for i in range(3)))
+        return executor.calls, results, queue.stats()
+
+    calls, results, stats = run(main())
+    assert calls == [("1", ["m0", "m1", "m2"])]
+    # 每个动作拿到自己的发送结果
+    assert results == ["1:m0", "1:m1", "1:m2"]
+    assert stats["merged"] == 2
+    assert stats["pending"] == 0
+
+
+def test_max_batch_splits_gui_cycles():
+    async def main():
+        executor = FakeExecutor()
+        queue = SendQueue(executor, max_batch=2)
+        await asyncio.gather(*(queue.submit("group", "1", f"m{i}") for i in range(5)))
+        return executor.calls
+
+    assert run(main()) == [("1", ["m0", "m1"]), ("1", ["m2", "m3"]), ("1", ["m4"])]
+
+
+def test_coalesce_window_waits_for_later_actions():
+    async def main():
+        executor = FakeExecutor()
+        queue = SendQueue(executor, coalesce_window=0.2)
+        first = asyncio.create_task(queue.submit("group", "1", "m0"))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(queue.submit("group", "1", "m1"))
+        await asyncio.gather(first, second)
+        return executor.calls
+
+    assert run(main()) == [("1", ["m0", "m1"])]
+
+
+def test_without_window_later_actions_get_their_own_cycle():
+    async def main():
+        executor = FakeExecutor()
+        queue = SendQueue(executor)
+        await queue.submit("group", "1", "m0")
+        await queue.submit("group", "1", "m1")
+        return executor.calls
+
+    assert run(main()) == [("1", ["m0"]), ("1", ["m1"])]
+
+
+def test_different_chats_are_not_merged():
+    async def main():
+        executor = FakeExecutor()
+        queue = SendQueue(executor)
+        await asyncio.gather(queue.submit("group", "1", "a"), queue.submit("private", "1", "b"))
+        return executor.calls
+
+    assert sorted(run(main())) == [("1", ["a"]), ("1", ["b"])]
+
+
+def test_executor_error_fails_every_action_in_the_batch():
+    async def main():
+        queue = SendQueue(FakeExecutor(fail=True))
+        return await asyncio.gather(*(queue.submit("group", "1", f"m{i}") for i in range(2)))
+
+    assert run(main()) == [None, None]
+
+
+def pending_item(queued_at: float):
+    return ([], None, queued_at)
+
+
+def test_affinity_prefers_the_open_chat():
+    queue = SendQueue(FakeExecutor())
+    now = time.monotonic()
+    queue._pending = {("group", "A"): [pending_item(now - 1)], ("group", "B"): [pending_item(now)]}
+    queue.current_chat = "B"
+    assert queue._select_key() == ("group", "B")
+    assert queue.stats()["switches_saved"] == 1
+
+
+def test_affinity_falls_back_to_the_oldest_chat():
+    queue = SendQueue(FakeExecutor())
+    now = time.monotonic()
+    queue._pending = {("group", "B"): [pending_item(now)], ("group", "A"): [pending_item(now - 1)]}
+    queue.current_chat = "C"
+    assert queue._select_key() == ("group", "A")
+
+
+def test_affinity_streak_limit_prevents_starvation():
+    queue = SendQueue(FakeExecutor(), max_affinity_streak=2)
+    now = time.monotonic()
+    queue._pending = {("group", "A"): [pending_item(now - 1)], ("group", "B"): [pending_item(now)]}
+    queue.current_chat = "B"
+    picks = [queue._select_key() for _ in range(3)]
+    assert picks == [("group", "B"), ("group", "B"), ("group", "A")]
+    assert queue.stats()["starvation_picks"] == 1
+
+
+def test_affinity_wait_limit_prevents_starvation():
+    queue = SendQueue(FakeExecutor(), max_affinity_wait=10)
+    now = time.monotonic()
+    queue._pending = {("group", "A"): [pending_item(now - 20)], ("group", "B"): [pending_item(now)]}
+    queue.current_chat = "B"
+    assert queue._select_key() == ("group", "A")
+
+
+def test_open_chat_is_sent_first_and_order_within_chats_is_kept():
+    async def main():
+        executor = FakeExecutor()
+        queue = SendQueue(executor, max_batch=1)
+        queue.current_chat = "B"
+        await asyncio.gather(
+            queue.submit("group", "A", "a0"),
+            queue.submit("group", "B", "b0"),
+            queue.submit("group", "A", "a1"),
+            queue.submit("group", "B", "b1"),
+        )
+        return executor.calls, queue.stats()
+
+    calls, stats = run(main())
+    assert calls == [("B", ["b0"]), ("B", ["b1"]), ("A", ["a0"]), ("A", ["a1"])]
+    assert stats["switches"] == 1
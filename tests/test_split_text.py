@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notify_auto import split_text
+
+
+def test_short_text_is_one_chunk():
+    assert split_text("你好", 10) == ["你好"]
+    assert split_text("一" * 10, 10) == ["一" * 10]
+
+
+def test_empty_text():
+    assert split_text("", 10) == []
+
+
+def test_prefers_newline():
+    text = "第一行内容。还有\n第二行内容"
+    assert split_text(text, 12) == ["第一行内容。还有", "第二行内容"]
+
+
+def test_breaks_after_sentence_end_with_closing_quote():
+    text = "他说：“好的。”然后走了很远的路"
+    assert split_text(text, 12) == ["他说：“好的。”", "然后走了很远的路"]
+
+
+def test_breaks_at_comma_without_sentence_end():
+    text = "甲乙丙丁戊，己庚辛壬癸子丑"
+    assert split_text(text, 10) == ["甲乙丙丁戊，", "己庚辛壬癸子丑"]
+
+
+def test_ignores_breaks_in_the_first_half():
+    # 前半段的断点会产生过短的片段，不使用
+    text = "甲。乙丙丁戊己庚辛壬癸子丑寅卯"
+    assert split_text(text, 10) == ["甲。乙丙丁戊己庚辛壬", "癸子丑寅卯"]
+
+
+def test_hard_cut_without_breaks():
+    assert split_text("一" * 25, 10) == ["一" * 10, "一" * 10, "一" * 5]
+
+
+def test_english_period_needs_following_space():
+    text = "Version 3.14 is out. Please update soon"
+    chunks = split_text(text, 24)
+    assert chunks[0] == "Version 3.14 is out."
+
+
+@pytest.mark.parametrize("limit", [5, 16, 50, 200])
+def test_chunks_respect_limit_and_keep_content(limit):
+    text = "今天天气很好，我们去公园散步吧！\n" * 8 + "Hello world. This is a test, ok? " * 5
+    chunks = split_text(text, limit)
+    assert all(0 < len(chunk) <= limit for chunk in chunks)
+    # 只会去掉断点处的空白
+    assert "".join(chunks).replace(" ", "").replace("\n", "") == text.replace(" ", "").replace("\n", "")
@@ -0,0 +1,209 @@
+import time
+import shutil
+import subprocess
+from typing import Callable, List, Optional, Tuple
+from log_config import logger
+
+Region = Tuple[int, int, int, int]  # (left, top, width, height)
+
+
+class WindowManager:
+    """
+    QQ 窗口管理器：按句柄激活 QQ 窗口并缓存其位置和大小，发送后重新激活之前的前台窗口。
+    查询和激活通过 python-xlib 完成，查找窗口以及 python-xlib 不可用时使用 xdotool。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        name: str = "QQ",
+        pid: Optional[int] = None,
+        refresh_interval: float = 2.0,
+        xdotool: str = "xdotool",
+    ):
+        self.enabled = enabled
+        self.name = name
+        self.pid = pid
+        self.refresh_interval = refresh_interval  # 窗口位置缓存的有效期（秒）
+        self.xdotool = shutil.which(xdotool) or xdotool
+        self.window: Optional[str] = None  # QQ 窗口句柄
+        self.geometry: Optional[Region] = None
+        self.previous_window: Optional[str] = None  # 激活 QQ 之前的前台窗口
+        self._checked_time = 0.0
+        self._listeners: List[Callable[[Region], None]] = []
+        self._display = None  # python-xlib 的 X 连接，第一次使用时建立
+        self._xlib_failed = False
+        self._net_active_window = 0
+
+    def _run(self, *args: str) -> str:
+        return subprocess.run(
+            [self.xdotool, *args], capture_output=True, text=True, check=True, timeout=5
+        ).stdout.strip()
+
+    def _xlib(self):
+        """返回进程内的 X 连接，python-xlib 不可用或连接失败时返回 None（之后使用 xdotool）。"""
+        if self._display is None and not self._xlib_failed:
+            try:
+                from Xlib import display
+
+                self._display = display.Display()
+                self._net_active_window = self._display.intern_atom("_NET_ACTIVE_WINDOW")
+            except Exception as e:
+                logger.warning(f"无法通过 python-xlib 连接 X 服务器，窗口操作退回到 xdotool: {e}")
+                self._xlib_failed = True
+        return self._display
+
+    def on_change(self, listener: Callable[[Region], None]):
+        """注册窗口位置或大小变化时的回调，参数为新的 (left, top, width, height)。"""
+        self._listeners.append(listener)
+
+    def find(self) -> Optional[str]:
+        """按 PID 或窗口名称查找 QQ 窗口，有多个匹配时取面积最大的窗口（主窗口）。"""
+        if self.pid:
+            args = ["search", "--onlyvisible", "--pid", str(self.pid)]
+        else:
+            args = ["search", "--onlyvisible", "--name", f"^{self.name}$"]
+        try:
+            windows = self._run(*args).split()
+        except (OSError, subprocess.SubprocessError):
+            windows = []
+        best, best_area = None, -1
+        for window in windows:
+            try:
+                left, top, width, height = self.read_geometry(window)
+            except (OSError, subprocess.SubprocessError, KeyError, ValueError):
+                continue
+            if width * height > best_area:
+                best, best_area = window, width * height
+        if best is None:
+            logger.warning(f"未找到 QQ 窗口: {self.pid or self.name}")
+        else:
+            logger.info(f"找到 QQ 窗口: {best}")
+        return best
+
+    def read_geometry(self, window: str) -> Region:
+        display = self._xlib()
+        if display is not None:
+            try:
+                resource = display.create_resource_object("window", int(window))
+                geometry = resource.get_geometry()
+                position = display.screen().root.translate_coords(resource, 0, 0)
+                return position.x, position.y, geometry.width, geometry.height
+            except Exception as e:
+                raise ValueError(f"读取窗口位置失败: {e}") from e
+        values = dict(line.split("=", 1) for line in self._run("getwindowgeometry", "--shell", window).splitlines())
+        return int(values["X"]), int(values["Y"]), int(values["WIDTH"]), int(values["HEIGHT"])
+
+    def refresh(self, force: bool = False) -> Optional[Region]:
+        """
+        返回 QQ 窗口的位置和大小。缓存在 refresh_interval 内有效，过期后重新读取一次，
+        窗口被移动或缩放时通知回调；窗口句柄失效（QQ 重启）时重新查找。
+        """
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        if not force and self.window and now - self._checked_time < self.refresh_interval:
+            return self.geometry
+        self._checked_time = now
+        geometry = None
+        if self.window:
+            try:
+                geometry = self.read_geometry(self.window)
+            except (OSError, subprocess.SubprocessError, KeyError, ValueError):
+                logger.warning(f"QQ 窗口句柄已失效: {self.window}")
+                self.window = None
+        if not self.window:
+            self.window = self.find()
+            if self.window:
+                try:
+                    geometry = self.read_geometry(self.window)
+                except (OSError, subprocess.SubprocessError, KeyError, ValueError):
+                    self.window = None
+        if geometry and geometry != self.geometry:
+            logger.info(f"QQ 窗口位置: {geometry}")
+            self.geometry = geometry
+            for listener in self._listeners:
+                listener(geometry)
+        return self.geometry
+
+    def active_window(self) -> Optional[str]:
+        display = self._xlib()
+        if display is not None:
+            from Xlib import X
+
+            try:
+                prop = display.screen().root.get_full_property(self._net_active_window, X.AnyPropertyType)
+            except Exception:
+                return None
+            return str(prop.value[0]) if prop is not None and len(prop.value) and prop.value[0] else None
+        try:
+            return self._run("getactivewindow")
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    def activate_window(self, window: str, timeout: float = 1.0):
+        """
+        请求窗口管理器激活窗口（_NET_ACTIVE_WINDOW），并等到它成为前台窗口，相当于 xdotool windowactivate --sync。
+        失败时抛出 OSError。
+        """
+        display = self._xlib()
+        if display is None:
+            self._run("windowactivate", "--sync", window)
+            return
+        from Xlib import X
+        from Xlib.protocol import event as xevent
+
+        root = display.screen().root
+        event = xevent.ClientMessage(
+            window=int(window),
+            client_type=self._net_active_window,
+            data=(32, [2, X.CurrentTime, 0, 0, 0]),  # 2：来自窗口切换工具的请求，窗口管理器不会拒绝
+        )
+        try:
+            root.send_event(event, event_mask=X.SubstructureRedirectMask | X.SubstructureNotifyMask)
+            display.flush()
+        except Exception as e:
+            raise OSError(f"发送激活请求失败: {e}") from e
+        deadline = time.monotonic() + timeout
+        while self.active_window() != window:
+            if time.monotonic() >= deadline:
+                raise OSError(f"等待窗口 {window} 激活超时")
+            time.sleep(0.005)
+
+    def is_active(self) -> bool:
+        return self.window is not None and self.active_window() == self.window
+
+    def activate(self) -> bool:
+        """按句柄激活 QQ 窗口，记录之前的前台窗口。QQ 已在前台时直接返回。失败时返回 False。"""
+        if not self.enabled or not self.refresh() or not self.window:
+            return False
+        active = self.active_window()
+        if active == self.window:
+            return True
+        try:
+            self.activate_window(self.window)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"激活 QQ 窗口失败: {e}")
+            return False
+        self.previous_window = active
+        return True
+
+    def deactivate(self) -> bool:
+        """重新激活 QQ 之前的前台窗口，让 QQ 失去焦点。QQ 不在前台时直接返回。失败时返回 False。"""
+        if not self.enabled or not self.window:
+            return False
+        if not self.is_active():
+            return True
+        if not self.previous_window:
+            return False
+        try:
+            self.activate_window(self.previous_window)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"切换到其他窗口失败: {e}")
+            self.previous_window = None
+            return False
+        return True
+
+
+# 全局 QQ 窗口管理器
+window_manager = WindowManager()
@@ -0,0 +1,99 @@
+from typing import Dict, List, Optional, Set
+from log_config import logger
+from gui_executor import GuiExecutor
+from send_queue import SendQueue
+from notify_auto import SendResult
+
+
+class Worker:
+    """一个 GUI 工作者：一个独立 X display 上的 QQ 实例，有自己的 GUI 执行器和发送队列。"""
+
+    def __init__(self, name: str, executor: GuiExecutor, queue: SendQueue, chats: Optional[Set[str]] = None):
+        self.name = name
+        self.executor = executor
+        self.queue = queue
+        self.chats = chats  # 该 QQ 实例能发送的聊天，None 表示所有聊天
+
+    @property
+    def load(self) -> int:
+        """排队中和正在执行的发送动作数。"""
+        return self.queue.stats()["pending"] + self.executor.pending
+
+    def can_serve(self, chat_id: str) -> bool:
+        return self.chats is None or chat_id in self.chats
+
+
+class WorkerPool:
+    """
+    多 QQ 实例的发送路由。
+
+    单个 QQ 窗口一次只能操作一个聊天，发送吞吐量受限于一个 GUI。多实例模式下每个 QQ 实例运行在自己的
+    X display（Xvfb）上，由一个 GUI 工作进程独占操作。路由器把每个 chat_id 分配给一个工作者：
+    - 同一聊天还有排队中或正在发送的动作时，新动作必须交给同一个工作者，保证同一聊天内消息的顺序；
+    - 否则在能发送该聊天的工作者中选择负载最低的一个，上一次发送该聊天的工作者负载不超过最低负载 + affinity_slack 时
+      优先继续使用它（该聊天可能仍然打开着，省去切换）。
+    对外提供与 SendQueue 相同的 submit / stats / set_config 接口。
+    """
+
+    def __init__(self, workers: List[Worker], affinity_slack: int = 1):
+        self.workers = workers
+        self.affinity_slack = affinity_slack
+        self.assignments: Dict[str, Worker] = {}  # chat_id 上一次分配到的工作者
+        self.reassignments = 0  # 聊天被分配到新工作者的次数
+
+    @classmethod
+    def from_config(cls, config: dict) -> "WorkerPool":
+        """
+        按配置中的 workers 列表创建工作者，每一项包含 display、可选的 chats（该实例能发送的聊天）
+        和可选的 config（覆盖全局配置，例如该实例的窗口坐标和输入后端）。
+        """
+        workers = []
+        for i, item in enumerate(config["workers"]):
+            worker_config = {**config, **(item.get("config") or {})}
+            worker_config.pop("workers", None)
+            executor = GuiExecutor(f"worker{i}", display=item["display"], config=worker_config)
+            queue = SendQueue(executor)
+            queue.set_config(worker_config)
+            chats = {str(chat_id) for chat_id in item["chats"]} if item.get("chats") else None
+            workers.append(Worker(f"worker{i}@{item['display']}", executor, queue, chats))
+        logger.info(f"多 QQ 实例模式，工作者：{[worker.name for worker in workers]}")
+        return cls(workers, config.get("WORKER_AFFINITY_SLACK", 1))
+
+    def set_config(self, config: dict):
+        for worker in self.workers:
+            worker.queue.set_config(config)
+
+    def route(self, chat_id: str) -> Worker:
+        """为 chat_id 选择一个工作者。"""
+        previous = self.assignments.get(chat_id)
+        if previous is not None and previous.queue.busy(chat_id):
+            return previous
+        candidates = [worker for worker in self.workers if worker.can_serve(chat_id)]
+        if not candidates:
+            logger.warning(f"没有工作者配置了聊天 {chat_id}，在所有工作者中选择")
+            candidates = self.workers
+        worker = min(candidates, key=lambda worker: worker.load)
+        if previous in candidates and previous.load <= worker.load + self.affinity_slack:
+            worker = previous
+        if worker is not previous:
+            self.reassignments += previous is not None
+            self.assignments[chat_id] = worker
+            logger.debug("聊天 %s 分配给 %s", chat_id, worker.name)
+        return worker
+
+    async def submit(self, message_type: str, chat_id, message: list) -> Optional[SendResult]:
+        """提交一个发送动作到负责该聊天的工作者，等待其被发送后返回发送结果，失败返回 None。"""
+        return await self.route(str(chat_id)).queue.submit(message_type, chat_id, message)
+
+    def stats(self) -> dict:
+        workers = {worker.name: {**worker.queue.stats(), "load": worker.load} for worker in self.workers}
+        totals = {}
+        for stat in workers.values():
+            for key, value in stat.items():
+                totals[key] = totals.get(key, 0) + value
+        totals.pop("load", None)
+        return {**totals, "reassignments": self.reassignments, "workers": workers}
+
+    def shutdown(self):
+        for worker in self.workers:
+            worker.executor.shutdown(wait=False)